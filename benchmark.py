@@ -0,0 +1,220 @@
+"""Throughput benchmark for File Splitter Pro.
+
+Generates reproducible synthetic inputs (narrow and wide CSV, CSV with quoted
+multiline fields, nested JSON), splits each one through SplitEngine for every
+input/output pair and split mode, and writes rows/s and MB/s as JSON:
+
+    python benchmark.py --rows 200000 --output results.json
+    python benchmark.py --output new.json --compare results.json
+
+The same --rows and --seed always generate byte-identical inputs, so result
+files from different versions of the engine can be compared directly.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+
+import splitengine
+
+# Dataset name -> (input extension, rows relative to --rows)
+DATASETS = {
+    'narrow_csv': ('.csv', 1.0),
+    'wide_csv': ('.csv', 0.1),
+    'multiline_csv': ('.csv', 0.5),
+    'nested_json': ('.json', 0.5),
+}
+OUTPUT_FORMATS = ('.csv', '.json')
+SPLIT_MODES = ('size', 'rows', 'files')
+PARTS_PER_RUN = 8  # Every mode is sized to produce about this many parts
+
+WORDS = ("alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+         "india", "juliett", "kilo", "lima", "mike", "november", "oscar", "papa")
+
+def random_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def generate_narrow_csv(path, rows, rng):
+    """Eight short columns of mixed types"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "date", "region", "customer", "quantity", "price", "status", "note"])
+        for i in range(rows):
+            writer.writerow([i, f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice(WORDS),
+                             rng.randint(1, 100000), rng.randint(1, 500), f"{rng.uniform(1, 1000):.2f}",
+                             rng.choice(("open", "closed", "pending")), random_text(rng, 3)])
+
+def generate_wide_csv(path, rows, rng, columns=200):
+    """Many numeric columns - stresses column projection"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["id"] + [f"metric_{c}" for c in range(1, columns)])
+        for i in range(rows):
+            writer.writerow([i] + [rng.randint(0, 99999) for _ in range(columns - 1)])
+
+def generate_multiline_csv(path, rows, rng):
+    """Quoted fields holding delimiters, doubled quotes and embedded newlines"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "body", "tags"])
+        for i in range(rows):
+            body = "\n".join(random_text(rng, rng.randint(2, 8)) for _ in range(rng.randint(1, 4)))
+            writer.writerow([i, f'"{random_text(rng, 2)}", {rng.choice(WORDS)}', body,
+                             ",".join(rng.sample(WORDS, 3))])
+
+def generate_nested_json(path, rows, rng):
+    """Array of objects nested two levels deep"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for i in range(rows):
+            if i:
+                f.write(",\n")
+            json.dump({
+                "id": i,
+                "customer": {"name": random_text(rng, 2), "tier": rng.choice(("gold", "silver", "bronze")),
+                             "address": {"city": rng.choice(WORDS), "zip": f"{rng.randint(0, 99999):05d}"}},
+                "order": {"quantity": rng.randint(1, 50), "total": round(rng.uniform(1, 5000), 2),
+                          "express": rng.random() < 0.3},
+                "note": random_text(rng, 4),
+            }, f)
+        f.write("]")
+
+GENERATORS = {
+    'narrow_csv': generate_narrow_csv,
+    'wide_csv': generate_wide_csv,
+    'multiline_csv': generate_multiline_csv,
+    'nested_json': generate_nested_json,
+}
+
+def prepare_dataset(data_dir, name, base_rows, seed):
+    """Generate a dataset unless an identical one (same rows and seed) already exists"""
+    ext, factor = DATASETS[name]
+    rows = max(int(base_rows * factor), PARTS_PER_RUN)
+    path = os.path.join(data_dir, f"{name}_{rows}_{seed}{ext}")
+    if not os.path.exists(path):
+        temp_path = path + ".tmp"
+        GENERATORS[name](temp_path, rows, random.Random(seed))
+        os.replace(temp_path, path)
+    return path, rows
+
+def split_value(mode, rows, input_size):
+    """Split value giving about PARTS_PER_RUN parts"""
+    if mode == "size":
+        return max(1, round(input_size / PARTS_PER_RUN / (1024 * 1024)))
+    if mode == "rows":
+        return max(1, rows // PARTS_PER_RUN)
+    return PARTS_PER_RUN
+
+def run_case(input_file, output_format, mode, value, output_dir, repeat, **engine_options):
+    """Split input_file repeat times and return the timings of the runs"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        shutil.rmtree(output_dir, ignore_errors=True)
+        options = splitengine.SplitOptions(input_file, mode=mode, value=value, output_dir=output_dir,
+                                           file_extension=output_format, create_log=False, **engine_options)
+        start = time.perf_counter()
+        result = splitengine.SplitEngine(options).run()
+        timings.append(time.perf_counter() - start)
+        if not result.passed:
+            raise RuntimeError(f"Row count validation failed for {input_file} -> {output_format} ({mode})")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return timings, result
+
+def run_benchmarks(args):
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), "filesplitter_bench")
+    os.makedirs(data_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="filesplitter_bench_out_")
+    engine_options = {'single_pass': not args.no_single_pass, 'parallel': args.parallel,
+                      'pipeline': args.pipeline, 'compression': args.compression}
+
+    results = []
+    try:
+        for name in args.datasets:
+            print(f"Preparing {name}...", file=sys.stderr)
+            input_file, rows = prepare_dataset(data_dir, name, args.rows, args.seed)
+            input_size = os.path.getsize(input_file)
+            for output_format in args.outputs:
+                for mode in args.modes:
+                    value = split_value(mode, rows, input_size)
+                    timings, result = run_case(input_file, output_format, mode, value,
+                                               os.path.join(work_dir, "out"), args.repeat, **engine_options)
+                    best = min(timings)
+                    entry = {
+                        'case': f"{name}:{splitengine.file_ext(input_file)[1:]}->{output_format[1:]}:{mode}",
+                        'dataset': name,
+                        'input_format': splitengine.file_ext(input_file),
+                        'output_format': output_format,
+                        'mode': mode,
+                        'value': value,
+                        'rows': result.input_rows,
+                        'input_bytes': input_size,
+                        'parts': result.parts,
+                        'seconds': timings,
+                        'best_seconds': best,
+                        'median_seconds': statistics.median(timings),
+                        'rows_per_sec': result.input_rows / best if best else 0,
+                        'mb_per_sec': input_size / (1024 * 1024) / best if best else 0,
+                    }
+                    results.append(entry)
+                    print(f"{entry['case']:<40} {entry['rows_per_sec']:>12,.0f} rows/s {entry['mb_per_sec']:>8.1f} MB/s",
+                          file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'rows': args.rows, 'seed': args.seed, 'repeat': args.repeat, **engine_options},
+        'results': results,
+    }
+
+def compare(report, baseline_file):
+    """Print the rows/s change of every case also present in a baseline result file"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline_report = json.load(f)
+    if baseline_report.get('settings', {}).get('rows') != report['settings']['rows']:
+        print("Warning: the baseline was generated with a different --rows value", file=sys.stderr)
+
+    baseline = {entry['case']: entry for entry in baseline_report['results']}
+    for entry in report['results']:
+        old = baseline.get(entry['case'])
+        if old and old['rows_per_sec']:
+            change = (entry['rows_per_sec'] / old['rows_per_sec'] - 1) * 100
+            print(f"{entry['case']:<40} {old['rows_per_sec']:>12,.0f} -> {entry['rows_per_sec']:>12,.0f} rows/s ({change:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure File Splitter Pro throughput on synthetic data")
+    parser.add_argument("--rows", type=int, default=200000, help="base row count per dataset (default 200000)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the generated data")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best is reported")
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument("--outputs", nargs="+", choices=OUTPUT_FORMATS + ('.jsonl', '.txt'), default=list(OUTPUT_FORMATS))
+    parser.add_argument("--modes", nargs="+", choices=SPLIT_MODES, default=list(SPLIT_MODES))
+    parser.add_argument("--parallel", action="store_true", help="enable parallel processing")
+    parser.add_argument("--pipeline", action="store_true", help="read, transform and write on separate threads (helps I/O-bound storage only)")
+    parser.add_argument("--no-single-pass", action="store_true", help="always run the row-counting pre-pass")
+    parser.add_argument("--compression", choices=list(splitengine.COMPRESSION_MODULES), help="compress output parts")
+    parser.add_argument("--data-dir", help="where generated inputs are kept between runs (default: system temp)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON result file")
+    parser.add_argument("--compare", help="earlier JSON result file to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3734 @@
+"""Headless split engine for File Splitter Pro.
+
+Everything needed to split a file lives here, free of any GUI dependency, so the
+same engine backs the Tk app, scripts, ETL jobs and process-pool workers:
+
+    options = SplitOptions("data.csv", mode="rows", value=100000)
+    result = SplitEngine(options, progress_callback=print).run()
+"""
+import os
+import csv
+import errno
+import json
+import math
+import time
+import threading
+import bisect
+import itertools
+import functools
+import heapq
+import pickle
+import shutil
+import tempfile
+import operator
+import io
+import collections
+import gzip
+import bz2
+import lzma
+import glob
+import re
+import hashlib
+import queue
+import multiprocessing
+import concurrent.futures
+import cProfile
+import pstats
+import tracemalloc
+
+# Compression formats for input (decompressed transparently) and output parts
+COMPRESSION_MODULES = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
+
+def compress_block(compression, data):
+    """Compress data as one complete .gz/.bz2/.xz stream (run in a worker thread)"""
+    if compression == '.gz':
+        # A fixed header timestamp keeps the parts (and their checksums) identical across runs
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return COMPRESSION_MODULES[compression].compress(data)
+
+def strip_compression(path):
+    """Return (path without a .gz/.bz2/.xz suffix, that suffix lower-cased or '')"""
+    root, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSION_MODULES:
+        return root, ext.lower()
+    return path, ''
+
+def is_compressed(path):
+    return bool(strip_compression(path)[1])
+
+class CompressedInput(io.BufferedIOBase):
+    """Binary reader that decompresses a .gz/.bz2/.xz file as it is read.
+
+    source_file is the underlying compressed file, so progress can be measured in
+    compressed bytes consumed against the size on disk.
+    """
+
+    def __init__(self, path):
+        self.source_file = open(path, 'rb')
+        self.stream = COMPRESSION_MODULES[strip_compression(path)[1]].open(self.source_file, 'rb')
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def read1(self, size=-1):
+        return self.stream.read1(size)
+
+    def readinto(self, buffer):
+        return self.stream.readinto(buffer)
+
+    def readline(self, size=-1):
+        return self.stream.readline(size)
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Backward seeks rewind and decompress again from the start
+        return self.stream.seek(offset, whence)
+
+    def tell(self):
+        return self.stream.tell()
+
+    def close(self):
+        if not self.closed:
+            self.stream.close()
+            self.source_file.close()
+        super().close()
+
+def open_input(path, mode='rb', encoding=None, newline=None):
+    """Open an input file for reading, decompressing .gz/.bz2/.xz transparently"""
+    if not is_compressed(path):
+        return open(path, mode, encoding=encoding, newline=newline)
+    stream = CompressedInput(path)
+    if 'b' in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+def input_position(file_obj):
+    """Bytes of the input file consumed so far - compressed bytes for compressed input"""
+    if isinstance(file_obj, io.TextIOWrapper):
+        file_obj = file_obj.buffer
+    return getattr(file_obj, 'source_file', file_obj).tell()
+
+class JsonStreamReader:
+    """Incrementally parse a top-level JSON array, yielding one element at a time.
+
+    Only the element currently being decoded is held in memory, so arrays far
+    larger than RAM can be processed. A top-level object is yielded once as a
+    single row (it has to be decoded whole).
+    """
+
+    def __init__(self, file_obj, chunk_size=1024 * 1024):
+        self.file_obj = file_obj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, size=None):
+        """Append the next chunk (size characters) to the buffer, discarding consumed text. Returns False at EOF."""
+        if self.eof:
+            return False
+        chunk = self.file_obj.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed text so the buffer stays bounded
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        """Advance past whitespace and return the next character ('' at EOF)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return ''
+
+    def decode_value(self):
+        """Decode the next complete JSON value from the buffer, reading more input as needed.
+
+        Each retry of a value split across chunks reads twice as much as the last,
+        so a huge element is decoded a logarithmic number of times, not once per chunk.
+        """
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Only an error at the end of the buffer, or a string still open there, can
+                # be a value cut off by the chunk edge - anything else is malformed input
+                cut = e.pos >= len(self.buffer) - 64 or e.msg.startswith('Unterminated string')
+                if not cut or not self.read_more(size):
+                    raise
+                size *= 2
+                continue
+            # A number cut at the chunk edge (e.g. "12" of "12.5e3") decodes successfully,
+            # so scalars must be followed by a separator before they are trusted
+            if not isinstance(value, (dict, list, str)):
+                truncated = end >= len(self.buffer) or self.buffer[end] not in ' \t\r\n,]}'
+                if truncated and self.read_more():
+                    continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        first = self.skip_whitespace()
+        if first == '{':
+            yield self.decode_value()
+            self.expect_end("Extra data after JSON object")
+            return
+        if first != '[':
+            raise ValueError("Unsupported JSON structure. Expected array of objects or single object.")
+
+        self.pos += 1
+        if self.skip_whitespace() == ']':
+            self.pos += 1
+            self.expect_end("Extra data after JSON array")
+            return
+
+        while True:
+            if not self.skip_whitespace():
+                raise ValueError("Unexpected end of JSON input: unterminated array.")
+            yield self.decode_value()
+
+            separator = self.skip_whitespace()
+            if not separator:
+                raise ValueError("Unexpected end of JSON input: unterminated array.")
+            self.pos += 1
+            if separator == ']':
+                self.expect_end("Extra data after JSON array")
+                return
+            if separator != ',':
+                raise ValueError(f"Invalid JSON array: expected ',' or ']' but found {separator!r}.")
+
+    def expect_end(self, message):
+        """Raise ValueError(message) unless only whitespace remains, as json.load would"""
+        if self.skip_whitespace():
+            raise ValueError(message)
+
+class JsonLinesReader:
+    """Yield the values of a JSON Lines (NDJSON) file, one line at a time.
+
+    The file should be opened in binary mode so tell() reports the byte offset
+    for progress while iterating, and offset is the position just past the line
+    of the last value yielded. Blank lines are skipped. When end is given,
+    reading stops at that byte position, which must be a line boundary.
+    """
+
+    def __init__(self, file_obj, end=None):
+        self.file_obj = file_obj
+        self.end = end
+        self.offset = None  # Byte offset just past the last line read
+
+    def __iter__(self):
+        self.offset = self.file_obj.tell()
+        for line_number, line in enumerate(self.file_obj, 1):
+            if self.end is not None and self.offset + len(line) > self.end:
+                break
+            self.offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid JSON on line {line_number:,}: {e}") from None
+
+class LineCounter:
+    """Decoded lines of a binary file for csv.reader, counting the bytes consumed.
+
+    csv.reader takes one line at a time and never reads ahead, so whenever it
+    returns a row, offset is the byte position just past that record. When end
+    is given, reading stops at that byte position, which must be a line boundary.
+    """
+
+    def __init__(self, file_obj, encoding='utf-8', end=None):
+        self.file_obj = file_obj
+        self.encoding = encoding
+        self.offset = file_obj.tell()
+        self.end = end
+
+    def seek(self, offset):
+        self.file_obj.seek(offset)
+        self.offset = offset
+
+    def __iter__(self):
+        for line in self.file_obj:
+            if self.end is not None and self.offset + len(line) > self.end:
+                break
+            self.offset += len(line)
+            yield line.decode(self.encoding)
+
+class CsvRecordScanner:
+    """Split a delimited file into blocks of raw records (bytes) without decoding or parsing.
+
+    Quoted fields may contain newlines, so a newline only ends a record when the
+    number of quote characters before it in the record is even (escaped quotes
+    are doubled and cancel out). With quotechar=None every newline ends a record,
+    as in JSON Lines. offset is the byte position of the next unread record. When
+    end is given, reading stops at that byte position, which must itself be a
+    record boundary.
+    """
+
+    def __init__(self, file_obj, quotechar=b'"', chunk_size=1024 * 1024, end=None):
+        self.file_obj = file_obj
+        self.quotechar = quotechar
+        self.chunk_size = chunk_size
+        self.offset = file_obj.tell()
+        self.end = end
+
+    def read_record(self):
+        """Read a single record, e.g. the header row"""
+        lines = []
+        in_quotes = False
+        while True:
+            line = self.file_obj.readline()
+            if not line:
+                break
+            lines.append(line)
+            if self.quotechar is not None and line.count(self.quotechar) & 1:
+                in_quotes = not in_quotes
+            if not in_quotes:
+                break
+
+        record = b''.join(lines)
+        self.offset += len(record)
+        return record
+
+    def last_record_end(self, data):
+        """Return the position just past the last complete record in data (0 if there is none)"""
+        newline = data.rfind(b'\n')
+        if newline < 0:
+            return 0
+        if self.quotechar is None or self.quotechar not in data:
+            return newline + 1
+
+        # Walk back over newlines that sit inside a quoted field
+        quotes = data.count(self.quotechar, 0, newline)
+        while quotes & 1:
+            previous = data.rfind(b'\n', 0, newline)
+            if previous < 0:
+                return 0
+            quotes -= data.count(self.quotechar, previous, newline)
+            newline = previous
+        return newline + 1
+
+    def blocks(self):
+        """Yield RecordBlock objects of roughly chunk_size bytes, each holding only whole records"""
+        leftover = b''
+        read_pos = self.offset
+        while True:
+            size = self.chunk_size if self.end is None else min(self.chunk_size, self.end - read_pos)
+            chunk = self.file_obj.read(size) if size > 0 else b''
+            read_pos += len(chunk)
+            if not chunk:
+                # Final record without a trailing newline
+                if leftover:
+                    self.offset += len(leftover)
+                    yield RecordBlock(leftover, self.quotechar)
+                return
+
+            data = leftover + chunk if leftover else chunk
+            end = self.last_record_end(data)
+            if end == 0:
+                # A single record larger than the chunk - keep reading
+                leftover = data
+                continue
+
+            leftover = data[end:]
+            self.offset += end
+            yield RecordBlock(data[:end] if leftover else data, self.quotechar)
+
+class RecordBlock:
+    """A run of complete raw records, with helpers to find record boundaries inside it"""
+
+    def __init__(self, data, quotechar=b'"'):
+        self.data = data
+        self.ends = None  # Record end positions, built lazily when lines and records differ
+
+        self.count = data.count(b'\n')
+
+        if not data.endswith(b'\n'):
+            # Unterminated final record of the file
+            self.count = 1
+            self.ends = [len(data)]
+        elif quotechar is not None and quotechar in data:
+            # A line ends a record only where the running quote count is even
+            lines = data.split(b'\n')
+            lines.pop()
+            quote_totals = list(itertools.accumulate(map(bytes.count, lines, itertools.repeat(quotechar))))
+            if any(map((1).__and__, quote_totals)):
+                # Quoted fields contain newlines - map every record end explicitly
+                line_ends = itertools.accumulate(map(len, lines))
+                self.ends = [length + index
+                             for index, (length, quotes) in enumerate(zip(line_ends, quote_totals), 1)
+                             if not quotes & 1]
+                self.count = len(self.ends)
+
+    def record_ends(self):
+        """Return the end position of every record in the block"""
+        if self.ends is None:
+            lengths = itertools.accumulate(map(len, self.data.split(b'\n')[:-1]))
+            self.ends = [length + index for index, length in enumerate(lengths, 1)]
+        return self.ends
+
+    def advance(self, start, max_rows=None, min_bytes=None):
+        """Take records from start, up to max_rows records or until at least min_bytes are covered.
+
+        Returns (end, rows). Stops early at the end of the block.
+        """
+        data = self.data
+        if max_rows is None and self.ends is None:
+            # Line-per-record block: the boundary is simply the next newline past the target
+            newline = data.find(b'\n', start + min_bytes - 1)
+            end = len(data) if newline < 0 else newline + 1
+            return end, data.count(b'\n', start, end)
+
+        ends = self.record_ends()
+        first = bisect.bisect_right(ends, start)
+        if max_rows is not None:
+            last = min(first + max_rows, len(ends)) - 1
+        else:
+            last = min(bisect.bisect_left(ends, start + min_bytes, first), len(ends) - 1)
+        return ends[last], last - first + 1
+
+CHECKSUM_ALGORITHMS = ('sha256', 'blake2b')  # Per-part checksums a manifest can record
+
+class PartWriter:
+    """Write numbered output parts ({base}_{n}{ext}) with batched writes and exact byte accounting.
+
+    The size of the current part is tracked in memory from the encoded length of
+    everything written, so rotation never needs flush()/tell() on the file. A part
+    rotates before a record is written once it has reached max_size_bytes or
+    max_rows, matching the original per-row check.
+
+    With compression ('.gz', '.bz2' or '.xz') each flushed buffer is compressed as
+    an independent stream in a thread pool, overlapping with the caller's parsing;
+    the concatenated streams form a valid file. size_target 'compressed' applies
+    max_size_bytes to the compressed part, estimated from the compression ratio
+    seen so far. Writers may share one compression executor, which they then
+    leave running on close.
+
+    Each finished part's size on disk and uncompressed size are recorded in
+    part_stats; with checksum ('sha256' or 'blake2b') the bytes are also hashed
+    as they are written, so parts never need to be read back.
+    """
+
+    def __init__(self, output_dir, base_filename, file_extension, max_size_bytes=None, max_rows=None,
+                 header=b'', buffer_size=1024 * 1024, compression=None, size_target='uncompressed',
+                 compression_workers=None, executor=None, checksum=None):
+        self.output_dir = output_dir
+        self.base_filename = base_filename
+        self.file_extension = file_extension
+        self.max_size_bytes = max_size_bytes
+        self.max_rows = max_rows
+        self.header = header
+        self.buffer_size = buffer_size
+        self.compression = compression
+        self.checksum = checksum
+        self.hasher = None  # Checksum of the current part's bytes on disk
+        self.compressed_target = bool(compression) and size_target == 'compressed' and max_size_bytes is not None
+        if self.compressed_target:
+            # Smaller blocks keep the estimate close to the size target
+            self.buffer_size = max(64 * 1024, min(buffer_size, max_size_bytes // 16))
+
+        self.executor = None
+        self.owns_executor = False
+        if compression:
+            workers = compression_workers or os.cpu_count() or 1
+            self.executor = executor
+            if executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+                self.owns_executor = True
+            self.max_pending = 2 * workers  # Bounds the memory held by blocks in flight
+        self.pending = collections.deque()  # (uncompressed size, future) in write order
+        self.compressed_in = 0   # Uncompressed bytes of the current part already written compressed
+        self.compressed_out = 0  # Compressed bytes of the current part on disk
+        self.ratio_in = 0        # Running totals for the compression ratio estimate
+        self.ratio_out = 0
+        self.write_time = 0.0     # Seconds spent writing (and compressing) output
+        self.rotation_time = 0.0  # Seconds spent closing and opening parts
+
+        self.part_num = 0
+        self.output_path = None
+        self.part_row_counts = []
+        self.part_stats = []  # {'bytes', 'uncompressed_bytes', 'checksum'} of each finished part
+        self.current_size = 0
+        self.current_rows = 0
+        self.file = None
+        self.suspended = False  # Current part's file closed by suspend() until resume()
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def get_part_path(self, part_num):
+        return os.path.join(self.output_dir, f"{self.base_filename}_{part_num}{self.file_extension}{self.compression or ''}")
+
+    def part_size(self):
+        """Size of the current part as measured against max_size_bytes"""
+        if not self.compressed_target:
+            return self.current_size
+        self.collect(block=False)
+        if not self.ratio_in and self.compressed_out + self.current_size - self.compressed_in >= self.max_size_bytes:
+            # No ratio known yet - compress what has been written so far to learn it
+            self.flush()
+            self.collect(block=True, limit=0)
+        ratio = self.ratio_out / self.ratio_in if self.ratio_in else 1.0
+        return self.compressed_out + int((self.current_size - self.compressed_in) * ratio)
+
+    def remaining_bytes(self):
+        """Uncompressed bytes that still fit in the current part"""
+        remaining = self.max_size_bytes - self.part_size()
+        if self.compressed_target and self.ratio_out:
+            remaining = int(remaining * self.ratio_in / self.ratio_out)
+        return remaining
+
+    def is_full(self):
+        """Check if the current part has reached its size or row limit"""
+        return (
+            (self.max_size_bytes is not None and self.part_size() >= self.max_size_bytes) or
+            (self.max_rows is not None and self.current_rows >= self.max_rows)
+        )
+
+    def open_part(self):
+        """Start the next numbered part and write its header"""
+        self.part_num += 1
+        self.output_path = self.get_part_path(self.part_num)
+        self.file = open(self.output_path, 'wb')
+        self.hasher = hashlib.new(self.checksum) if self.checksum else None
+        self.current_size = 0
+        self.current_rows = 0
+        self.compressed_in = 0
+        self.compressed_out = 0
+        if self.header:
+            self.write_bytes(self.header)
+
+    def close_part(self):
+        """Flush and close the current part, recording its row count"""
+        self.flush()
+        start = time.perf_counter()
+        self.collect(block=True, limit=0)
+        self.file.close()
+        self.write_time += time.perf_counter() - start
+        self.file = None
+        self.part_row_counts.append(self.current_rows)
+        self.part_stats.append({
+            'bytes': self.compressed_out if self.compression else self.current_size,
+            'uncompressed_bytes': self.current_size,
+            'checksum': self.hasher.hexdigest() if self.hasher is not None else None,
+        })
+
+    def rotate(self):
+        start, write_time = time.perf_counter(), self.write_time
+        self.close_part()
+        self.open_part()
+        self.rotation_time += time.perf_counter() - start - (self.write_time - write_time)
+
+    def checkpoint(self):
+        """Write everything so far through to disk and return the state restore() needs to continue after it"""
+        if self.file is not None:
+            self.flush()
+            self.collect(block=True, limit=0)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        return {
+            'part_num': self.part_num,
+            'part_row_counts': list(self.part_row_counts),
+            'part_stats': list(self.part_stats),
+            'current_size': self.current_size,
+            'current_rows': self.current_rows,
+            'compressed_in': self.compressed_in,
+            'compressed_out': self.compressed_out,
+            'ratio_in': self.ratio_in,
+            'ratio_out': self.ratio_out,
+            'file_size': self.file.tell() if self.file is not None else None,
+        }
+
+    def restore(self, state):
+        """Continue from a checkpoint() state: parts started after it are deleted and the
+        current part is truncated to the length it had, which ends on a record boundary"""
+        self.part_num = state['part_num']
+        self.part_row_counts = list(state['part_row_counts'])
+        self.part_stats = list(state['part_stats'])
+        self.current_size = state['current_size']
+        self.current_rows = state['current_rows']
+        self.compressed_in = state['compressed_in']
+        self.compressed_out = state['compressed_out']
+        self.ratio_in = state['ratio_in']
+        self.ratio_out = state['ratio_out']
+
+        later = self.part_num + 1
+        while os.path.exists(self.get_part_path(later)):
+            os.remove(self.get_part_path(later))
+            later += 1
+
+        if state['file_size'] is not None:
+            self.output_path = self.get_part_path(self.part_num)
+            if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) < state['file_size']:
+                raise ValueError(f"{os.path.basename(self.output_path)} is shorter than its checkpoint, so the split cannot be resumed.")
+            self.file = open(self.output_path, 'r+b')
+            self.file.truncate(state['file_size'])
+            if self.checksum:
+                # Only the kept start of this one part is read back to continue its checksum
+                self.hasher = hashlib.new(self.checksum)
+                for chunk in iter(functools.partial(self.file.read, 1024 * 1024), b''):
+                    self.hasher.update(chunk)
+            self.file.seek(state['file_size'])
+
+    def suspend(self):
+        """Close the current part's file without finishing the part, releasing its handle"""
+        if self.file is not None:
+            start, write_time = time.perf_counter(), self.write_time
+            self.flush()
+            self.collect(block=True, limit=0)
+            self.file.close()
+            self.file = None
+            self.suspended = True
+            self.rotation_time += time.perf_counter() - start - (self.write_time - write_time)
+
+    def resume(self):
+        """Reopen a suspended part for appending"""
+        if self.suspended:
+            start = time.perf_counter()
+            self.file = open(self.output_path, 'ab')
+            self.suspended = False
+            self.rotation_time += time.perf_counter() - start
+
+    def write_bytes(self, data, rows=0):
+        """Append encoded data holding the given number of rows to the current part (no rotation check)"""
+        self.buffer.append(data)
+        self.buffered_bytes += len(data)
+        self.current_size += len(data)
+        self.current_rows += rows
+        if self.buffered_bytes >= self.buffer_size:
+            self.flush()
+
+    def write_record(self, data, rows=1):
+        """Write one encoded record, rotating to a new part first if the current one is full"""
+        if self.file is None:
+            self.open_part()
+        elif self.is_full():
+            self.rotate()
+        self.write_bytes(data, rows)
+
+    def write_block(self, block):
+        """Write a RecordBlock of raw records, rotating parts at exact record boundaries"""
+        data = memoryview(block.data)
+        start = 0
+        while start < len(data):
+            if self.file is None:
+                self.open_part()
+            elif self.is_full():
+                self.rotate()
+
+            if self.max_size_bytes is not None:
+                end, rows = block.advance(start, min_bytes=self.remaining_bytes())
+            elif self.max_rows is not None:
+                end, rows = block.advance(start, max_rows=self.max_rows - self.current_rows)
+            else:
+                end, rows = len(data), block.count
+            self.write_bytes(data[start:end], rows)
+            start = end
+
+    def flush(self):
+        if self.buffer:
+            start = time.perf_counter()
+            data = b''.join(self.buffer)
+            if self.executor is None:
+                self.write_file(data)
+            else:
+                self.pending.append((len(data), self.executor.submit(compress_block, self.compression, data)))
+                self.collect(block=True, limit=self.max_pending)
+            self.buffer = []
+            self.buffered_bytes = 0
+            self.write_time += time.perf_counter() - start
+
+    def write_file(self, data):
+        self.file.write(data)
+        if self.hasher is not None:
+            self.hasher.update(data)
+
+    def collect(self, block, limit=None):
+        """Write finished compressed blocks in order.
+
+        With block, wait until no more than limit blocks are still in flight;
+        otherwise only take the blocks that are already done.
+        """
+        while self.pending:
+            size, future = self.pending[0]
+            if block:
+                if len(self.pending) <= limit and not future.done():
+                    break
+            elif not future.done():
+                break
+            data = future.result()
+            self.pending.popleft()
+            self.write_file(data)
+            self.compressed_in += size
+            self.compressed_out += len(data)
+            self.ratio_in += size
+            self.ratio_out += len(data)
+
+    def close(self):
+        self.resume()
+        if self.file is not None:
+            self.close_part()
+        if self.owns_executor:
+            self.executor.shutdown()
+        self.executor = None
+
+class CsvPartWriter(PartWriter):
+    """PartWriter that serializes rows with csv.writer and encodes them as UTF-8"""
+
+    def __init__(self, output_dir, base_filename, file_extension, delimiter, quoting, header_row=None, **limits):
+        self.lines = []
+        self.csv_writer = csv.writer(self, delimiter=delimiter, quoting=quoting)
+        header = self.serialize(header_row) if header_row is not None else b''
+        super().__init__(output_dir, base_filename, file_extension, header=header, **limits)
+
+    def write(self, text):
+        """Target for csv.writer - collects each serialized row"""
+        self.lines.append(text)
+
+    def serialize(self, row):
+        self.csv_writer.writerow(row)
+        return self.lines.pop().encode('utf-8')
+
+    def write_row(self, row):
+        self.write_record(self.serialize(row))
+
+    def write_rows(self, rows):
+        """Serialize a block of rows with one writerows call and write them in as few batches as
+        the part limits allow, rotating at exactly the same rows as write_row would"""
+        self.csv_writer.writerows(rows)
+        records = [line.encode('utf-8') for line in self.lines]
+        self.lines = []
+        start = 0
+        while start < len(records):
+            if self.file is None:
+                self.open_part()
+            elif self.is_full():
+                self.rotate()
+
+            if self.max_size_bytes is not None:
+                # Take records until the part reaches the size target - the record crossing it is kept
+                remaining, end = self.remaining_bytes(), start
+                while end < len(records) and remaining > 0:
+                    remaining -= len(records[end])
+                    end += 1
+                end = max(end, start + 1)
+            elif self.max_rows is not None:
+                end = start + max(self.max_rows - self.current_rows, 1)
+            else:
+                end = len(records)
+            batch = records[start:end]
+            self.write_bytes(b''.join(batch), len(batch))
+            start = end
+
+class JsonPartWriter(PartWriter):
+    """PartWriter that streams each part as a JSON array, serializing objects as they arrive.
+
+    Parts are compact arrays ('[' + objects joined by ',' + ']'), the same bytes
+    json.dump gives for the whole list, but only one object is held in memory. In
+    size mode a part rotates before an object that would take it past
+    max_size_bytes, so parts never exceed the target unless one object is larger.
+    """
+
+    opening = b'['
+    separator = b','
+    terminator = b''
+    closing = b']'
+
+    def __init__(self, output_dir, base_filename, file_extension, **limits):
+        super().__init__(output_dir, base_filename, file_extension, header=self.opening, **limits)
+        self.encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def write_object(self, obj):
+        data = self.encoder.encode(obj).encode('utf-8') + self.terminator
+        if self.file is None:
+            self.open_part()
+        elif self.current_rows:
+            data = self.separator + data
+            if ((self.max_rows is not None and self.current_rows >= self.max_rows) or
+                    # The record and the closing bracket must both still fit
+                    (self.max_size_bytes is not None
+                     and len(data) + len(self.closing) > self.remaining_bytes())):
+                self.rotate()
+                data = data[len(self.separator):]
+        self.write_bytes(data, 1)
+
+    def write_objects(self, objs):
+        for obj in objs:
+            self.write_object(obj)
+
+    def close_part(self):
+        self.write_bytes(self.closing)
+        super().close_part()
+
+class JsonLinesPartWriter(JsonPartWriter):
+    """JsonPartWriter for JSON Lines (NDJSON) parts - one object per line, no enclosing array"""
+
+    opening = b''
+    separator = b''
+    terminator = b'\n'
+    closing = b''
+
+def partition_filename(key):
+    """File-name-safe form of a partition key"""
+    name = re.sub(r'[^\w.-]+', '_', str(key)).strip('._')[:80]
+    return name or "blank"
+
+class PartitionedWriter:
+    """Route rows to one PartWriter per partition key, each writing {base}_{key}_{n}{ext}.
+
+    new_writer(base_filename) creates the (lazily opened) writer for a new key, so
+    size and row limits apply within each key. At most max_open writers keep their
+    part file open; the least recently used one is suspended when another key
+    needs a handle, so any number of keys fit within the file descriptor limit.
+    Keys that map to the same file name get a ~n suffix.
+    """
+
+    def __init__(self, base_filename, new_writer, max_open=256, executor=None):
+        self.base_filename = base_filename
+        self.new_writer = new_writer
+        self.max_open = max_open
+        self.executor = executor  # Compression executor shared by the key writers
+        self.writers = {}  # Every key's writer, in order of first appearance
+        self.open_writers = collections.OrderedDict()  # Keys with an open file, least recently used first
+        self.used_names = set()
+        self.output_path = None
+
+    def writer(self, key):
+        writer = self.writers.get(key)
+        if writer is None:
+            name = partition_filename(key)
+            candidate, n = name, 1
+            while candidate.lower() in self.used_names:  # Case-insensitive file systems
+                n += 1
+                candidate = f"{name}~{n}"
+            self.used_names.add(candidate.lower())
+            writer = self.writers[key] = self.new_writer(f"{self.base_filename}_{candidate}")
+
+        if key in self.open_writers:
+            self.open_writers.move_to_end(key)
+        else:
+            if len(self.open_writers) >= self.max_open:
+                _, evicted = self.open_writers.popitem(last=False)
+                evicted.suspend()
+            writer.resume()
+            self.open_writers[key] = writer
+        return writer
+
+    def write_rows(self, rows, keys, method):
+        """Write a block of rows by key, calling writer.<method>(rows) once per key"""
+        groups = {}
+        for row, key in zip(rows, keys):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = []
+            group.append(row)
+        for key, group in groups.items():
+            writer = self.writer(key)
+            getattr(writer, method)(group)
+            self.output_path = writer.output_path
+
+    @property
+    def part_num(self):
+        return sum(writer.part_num for writer in self.writers.values())
+
+    @property
+    def part_row_counts(self):
+        return [count for writer in self.writers.values() for count in writer.part_row_counts]
+
+    @property
+    def part_stats(self):
+        return [stats for writer in self.writers.values() for stats in writer.part_stats]
+
+    @property
+    def part_paths(self):
+        return [writer.get_part_path(n) for writer in self.writers.values() for n in range(1, writer.part_num + 1)]
+
+    @property
+    def write_time(self):
+        return sum(writer.write_time for writer in self.writers.values())
+
+    @property
+    def rotation_time(self):
+        return sum(writer.rotation_time for writer in self.writers.values())
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.open_writers.clear()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+class SourceRanges:
+    """Map every finished part to the input byte range its records were read from.
+
+    After each block of records is written, note() gets the writer's
+    part_row_counts, the block's record count, offset_of(i) - the input offset
+    just past record i of the block - and the offset past the whole block. Parts
+    rotate just before their next record is written, so a part can finish one
+    block after its last record was read.
+    """
+
+    def __init__(self, start, ranges=(), mapped_rows=0, written=0, last_end=None):
+        self.start = start  # Input offset of the first record of the next part to map
+        self.ranges = [list(source) for source in ranges]  # [start, end) of each finished part
+        self.mapped_rows = mapped_rows  # Records in the parts mapped so far
+        self.written = written  # Records written so far
+        self.last_end = start if last_end is None else last_end  # Offset past the last record written
+
+    def note(self, part_row_counts, count=0, offset_of=None, end=None):
+        block_first = self.written
+        for rows in part_row_counts[len(self.ranges):]:
+            self.mapped_rows += rows
+            index = self.mapped_rows - block_first - 1
+            if rows == 0:
+                part_end = self.start
+            elif index >= 0:
+                part_end = offset_of(index)
+            else:
+                part_end = self.last_end
+            self.ranges.append([self.start, part_end])
+            self.start = part_end
+        self.written += count
+        if end is not None:
+            self.last_end = end
+
+    def state(self):
+        """Keyword arguments that recreate this mapping, e.g. from a checkpoint"""
+        return {'start': self.start, 'ranges': self.ranges, 'mapped_rows': self.mapped_rows,
+                'written': self.written, 'last_end': self.last_end}
+
+CHECKPOINT_VERSION = 2
+
+class Checkpoint:
+    """Resume point of a sequential split, kept as {base}_checkpoint.json next to the parts.
+
+    A checkpoint holds the input offset just past the last record written, the
+    rows processed so far and the PartWriter state. A run may only resume from it
+    when its signature (input file version and split settings) matches. It is
+    saved atomically, at most every interval seconds.
+    """
+
+    def __init__(self, path, signature, interval=10.0):
+        self.path = path
+        self.signature = signature
+        self.interval = interval
+        self.last_save = time.monotonic()
+
+    def due(self):
+        return time.monotonic() - self.last_save >= self.interval
+
+    def load(self):
+        """The saved state, or None if there is no readable checkpoint"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state if state.get('version') == CHECKPOINT_VERSION else None
+
+    def save(self, state):
+        state = dict(state, version=CHECKPOINT_VERSION, signature=self.signature)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.last_save = time.monotonic()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+INDEX_SUFFIX = '.splitidx'
+INDEX_VERSION = 1
+
+class RecordIndex:
+    """Record layout of a delimited or JSON Lines file, built by one fast unparsed scan.
+
+    blocks lists (start, end, rows) byte ranges holding whole records. When the
+    scan is given part_bytes (the data bytes a raw size-based part holds before it
+    rotates), part_boundaries lists (offset, rows_before) for every point where a
+    sequential raw split would start a new part.
+
+    The index can be saved as a sidecar file next to the input ({input}.splitidx),
+    keyed by the input's size, mtime and delimiter, so later runs get the row total
+    and record offsets without scanning again.
+    """
+
+    def __init__(self, header_record, blocks, part_boundaries=None, part_bytes=None):
+        self.header_record = header_record
+        self.blocks = blocks
+        self.part_boundaries = part_boundaries
+        self.part_bytes = part_bytes
+        self.total_rows = sum(rows for _, _, rows in blocks)
+        self.first_rows = list(itertools.accumulate((rows for _, _, rows in blocks), initial=0))
+
+    @classmethod
+    def build(cls, input_file, cancel_event=None, on_block=None, part_bytes=None):
+        """Scan input_file. Returns None if cancelled.
+
+        on_block is called with the running row total after each block.
+        """
+        blocks = []
+        part_boundaries = [] if part_bytes else None
+        total_rows = 0
+        remaining = part_bytes
+
+        quotechar, has_header = record_layout(input_file)
+        with open_input(input_file, 'rb') as infile:
+            scanner = CsvRecordScanner(infile, quotechar)
+            header_record = scanner.read_record() if has_header else b''
+            start = scanner.offset
+            for block in scanner.blocks():
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+
+                if part_bytes:
+                    # Replay the PartWriter size check to find where each part ends
+                    position = 0
+                    rows_before = total_rows
+                    while position < len(block.data):
+                        end, rows = block.advance(position, min_bytes=remaining)
+                        rows_before += rows
+                        if end - position >= remaining:
+                            remaining = part_bytes
+                            part_boundaries.append((start + end, rows_before))
+                        else:
+                            remaining -= end - position
+                        position = end
+
+                blocks.append((start, scanner.offset, block.count))
+                start = scanner.offset
+                total_rows += block.count
+                if on_block is not None:
+                    on_block(total_rows)
+
+        if part_boundaries and part_boundaries[-1][0] >= start:
+            part_boundaries.pop()  # The file ends exactly on a boundary - no part follows it
+        return cls(header_record, blocks, part_boundaries, part_bytes)
+
+    @staticmethod
+    def sidecar_path(input_file):
+        return input_file + INDEX_SUFFIX
+
+    @staticmethod
+    def sidecar_key(input_file, delimiter):
+        """Identity of the input the sidecar describes - any change makes the index stale"""
+        stat = os.stat(input_file)
+        return {'version': INDEX_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'delimiter': delimiter}
+
+    @classmethod
+    def load(cls, input_file, delimiter, part_bytes=None):
+        """Load the sidecar index of input_file, or return None if it is missing or stale.
+
+        part_boundaries is only filled in when the sidecar holds them for part_bytes.
+        """
+        try:
+            with open(cls.sidecar_path(input_file), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('key') != cls.sidecar_key(input_file, delimiter):
+                return None
+            with open(input_file, 'rb') as infile:
+                header_record = infile.read(data['header_size'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+        boundaries = data.get('part_boundaries', {}).get(str(part_bytes)) if part_bytes else None
+        return cls(header_record, [tuple(block) for block in data['blocks']],
+                   [tuple(boundary) for boundary in boundaries] if boundaries is not None else None,
+                   part_bytes if boundaries is not None else None)
+
+    def save(self, input_file, delimiter):
+        """Write the index as a sidecar next to input_file (skipped if the folder is read-only)"""
+        path = self.sidecar_path(input_file)
+        key = self.sidecar_key(input_file, delimiter)
+        part_boundaries = {}
+        try:
+            # Keep the part boundaries recorded for other part sizes of the same input
+            with open(path, 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+            if existing.get('key') == key:
+                part_boundaries = existing.get('part_boundaries', {})
+        except (OSError, ValueError):
+            pass
+        if self.part_boundaries is not None:
+            part_boundaries[str(self.part_bytes)] = self.part_boundaries
+
+        data = {
+            'key': key,
+            'header_size': len(self.header_record),
+            'total_rows': self.total_rows,
+            'blocks': self.blocks,
+            'part_boundaries': part_boundaries,
+        }
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+        except OSError:
+            pass
+
+    def row_offset(self, input_file, row):
+        """Return the byte offset where data row number row (0-based) starts; total_rows gives the end"""
+        if not self.blocks:
+            return len(self.header_record)
+        if row >= self.total_rows:
+            return self.blocks[-1][1]
+        index = bisect.bisect_right(self.first_rows, row) - 1
+        start, end, _ = self.blocks[index]
+        records = row - self.first_rows[index]
+        return start if records == 0 else locate_record_end(input_file, start, end, records)
+
+def header_line_bytes(input_file):
+    """Return the raw bytes of the first record (the header row) of a delimited file"""
+    with open(input_file, 'rb') as infile:
+        return CsvRecordScanner(infile).read_record()
+
+def complete_lines_end(input_file, chunk_size=64 * 1024):
+    """Return the byte offset just past the last newline of a file (0 if there is none).
+
+    Everything before it has been written in whole lines, even while the file is
+    still being appended to.
+    """
+    with open(input_file, 'rb') as infile:
+        end = infile.seek(0, io.SEEK_END)
+        while end > 0:
+            start = max(0, end - chunk_size)
+            infile.seek(start)
+            newline = infile.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+def complete_records_end(input_file, start=0):
+    """Return the byte offset just past the last complete record of a delimited or JSON Lines file.
+
+    start must be a record boundary. JSON Lines records are single lines, so the
+    last newline is found from the end; a newline inside a quoted field does not
+    end a delimited record, so those are scanned forward from start to keep track
+    of the open quotes. A final record without its newline counts as incomplete.
+    """
+    quotechar, _ = record_layout(input_file)
+    if quotechar is None:
+        return max(start, complete_lines_end(input_file))
+    with open(input_file, 'rb') as infile:
+        infile.seek(start)
+        scanner = CsvRecordScanner(infile, quotechar)
+        end = start
+        for block in scanner.blocks():
+            # Only the unterminated remainder at the end of the file is cut short
+            end += scanner.last_record_end(block.data)
+    return end
+
+def input_prefix_digest(input_file, length, limit=64 * 1024):
+    """SHA-256 of the first length bytes of a file (at most limit), to recognise it once it has grown"""
+    with open(input_file, 'rb') as infile:
+        return hashlib.sha256(infile.read(min(length, limit))).hexdigest()
+
+def locate_record_end(input_file, start, end, records):
+    """Return the byte offset just past the given number of records counted from start"""
+    with open(input_file, 'rb') as infile:
+        infile.seek(start)
+        block = RecordBlock(infile.read(end - start), record_layout(input_file)[0])
+    return start + block.advance(0, max_rows=records)[0]
+
+def plan_byte_ranges(input_file, blocks, target_bytes, align_rows=None):
+    """Group scanned record blocks into byte ranges of roughly target_bytes.
+
+    Every range starts and ends on a record boundary. With align_rows, each range
+    (except the last) holds a multiple of align_rows records, so row-based parts
+    come out exactly as they would from a sequential split. Returns a list of
+    (start, end, rows).
+    """
+    ranges = []
+    pending = []  # (start, end, first_row, rows) of blocks not yet assigned to a range
+    total = 0
+    for start, end, rows in blocks:
+        pending.append((start, end, total, rows))
+        total += rows
+        range_start, range_first_row = pending[0][0], pending[0][2]
+        if end - range_start < target_bytes:
+            continue
+
+        cut_row = total if not align_rows else (total // align_rows) * align_rows
+        if cut_row <= range_first_row:
+            continue  # Not a whole group of rows yet
+
+        for index, (block_start, block_end, first_row, block_rows) in enumerate(pending):
+            if first_row < cut_row <= first_row + block_rows:
+                break
+        if cut_row == first_row + block_rows:
+            cut = block_end
+            pending = pending[index + 1:]
+        else:
+            cut = locate_record_end(input_file, block_start, block_end, cut_row - first_row)
+            pending = [(cut, block_end, cut_row, first_row + block_rows - cut_row)] + pending[index + 1:]
+        ranges.append((range_start, cut, cut_row - range_first_row))
+
+    if pending:
+        ranges.append((pending[0][0], pending[-1][1], total - pending[0][2]))
+    return ranges
+
+def plan_part_ranges(index, target_bytes):
+    """Group whole size-based parts (index.part_boundaries) into byte ranges of roughly target_bytes"""
+    if not index.blocks:
+        return []
+
+    ranges = []
+    range_start, range_first_row = index.blocks[0][0], 0
+    for offset, rows_before in index.part_boundaries:
+        if offset - range_start >= target_bytes:
+            ranges.append((range_start, offset, rows_before - range_first_row))
+            range_start, range_first_row = offset, rows_before
+    ranges.append((range_start, index.blocks[-1][1], index.total_rows - range_first_row))
+    return ranges
+
+def split_byte_range(task):
+    """Process-pool worker: split one byte range of a delimited or JSON Lines file into temporary parts.
+
+    task is a plain dict so it can be pickled. Returns the part paths, their row
+    counts and part_stats in order, this worker's phase timings and, with
+    task['manifest'], each part's input byte range.
+    """
+    clock = time.perf_counter
+    start_time = clock()
+    projection_time = write_calls = 0.0
+    sources = SourceRanges(task['start']) if task['manifest'] else None
+    with open(task['input_file'], 'rb') as infile:
+        infile.seek(task['start'])
+        quotechar, _ = record_layout(task['input_file'])
+        scanner = CsvRecordScanner(infile, quotechar, end=task['end'])
+        limits = task['limits']
+
+        def note_sources(block_start, count, record_ends):
+            # Record ends are only looked up for blocks where a part boundary falls
+            if sources is not None:
+                sources.note(writer.part_row_counts, count, lambda i: block_start + record_ends()[i], scanner.offset)
+
+        if task['raw']:
+            writer = PartWriter(task['output_dir'], task['part_prefix'], task['file_extension'],
+                                header=task['header_record'] if task['include_header'] else b'', **limits)
+            block_start = scanner.offset
+            for block in scanner.blocks():
+                t1 = clock()
+                writer.write_block(block)
+                write_calls += clock() - t1
+                note_sources(block_start, block.count, block.record_ends)
+                block_start = scanner.offset
+        else:
+            json_output = task['file_extension'] in JSON_EXTENSIONS
+            if json_output:
+                writer = JsonLinesPartWriter(task['output_dir'], task['part_prefix'], task['file_extension'], **limits)
+                write, write_rows = writer.write_object, writer.write_objects
+            else:
+                writer = CsvPartWriter(task['output_dir'], task['part_prefix'], task['file_extension'],
+                                       task['delimiter'], task['quote_mode'],
+                                       header_row=task['output_header'] if task['include_header'] else None,
+                                       **limits)
+                write, write_rows = writer.write_row, writer.write_rows
+            output_header = task['output_header']
+            if quotechar is None:
+                project = JsonProjection(task['filtered_header'], output_header if json_output else None)
+            else:
+                project_rows = RowProjection(task['header_indices'], output_header if json_output else None).project_rows
+
+            block_start = scanner.offset
+            for block in scanner.blocks():
+                if quotechar is None:
+                    # JSON Lines input - blank lines hold no record, so their ends are skipped
+                    line_ends = []
+                    position = 0
+                    for line in block.data.splitlines(keepends=True):
+                        position += len(line)
+                        if not line.strip():
+                            continue
+                        line_ends.append(position)
+                        json_row = json.loads(line)
+                        t1 = clock()
+                        row = project(json_row)
+                        t2 = clock()
+                        write(row)
+                        t3 = clock()
+                        projection_time += t2 - t1
+                        write_calls += t3 - t2
+                    note_sources(block_start, len(line_ends), lambda: line_ends)
+                else:
+                    text = io.StringIO(block.data.decode('utf-8'), newline='')
+                    for rows in row_blocks(csv.reader(text, delimiter=task['input_delimiter'])):
+                        t1 = clock()
+                        rows = project_rows(rows)
+                        t2 = clock()
+                        write_rows(rows)
+                        t3 = clock()
+                        projection_time += t2 - t1
+                        write_calls += t3 - t2
+                    note_sources(block_start, block.count, block.record_ends)
+                block_start = scanner.offset
+        t1 = clock()
+        writer.close()
+        write_calls += clock() - t1
+        if sources is not None:
+            sources.note(writer.part_row_counts)
+
+    part_paths = [writer.get_part_path(n) for n in range(1, writer.part_num + 1)]
+    timings = writer_phase_times(writer, projection_time, write_calls)
+    timings['total'] = clock() - start_time
+    return part_paths, writer.part_row_counts, timings, writer.part_stats, sources and sources.ranges
+
+def writer_phase_times(writer, projection_time, write_calls):
+    """Split the time spent in a PartWriter's write calls into serialization, writes and rotation"""
+    return {
+        'projection': projection_time,
+        'serialization': max(0.0, write_calls - writer.write_time - writer.rotation_time),
+        'writes': writer.write_time,
+        'rotation': writer.rotation_time,
+    }
+
+
+QUOTE_MODE_NAMES = {
+    csv.QUOTE_MINIMAL: "Standard",
+    csv.QUOTE_ALL: "All fields",
+    csv.QUOTE_NONE: "Never quote",
+}
+
+SUPPORTED_INPUT_EXTENSIONS = ('.csv', '.tsv', '.txt', '.dat', '.json', '.jsonl', '.ndjson')
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+JSON_EXTENSIONS = ('.json',) + JSON_LINES_EXTENSIONS
+
+def file_ext(path):
+    """Lower-cased extension of path, looking through a .gz/.bz2/.xz suffix"""
+    return os.path.splitext(strip_compression(path.lower())[0])[1]
+
+def is_json_lines(path):
+    return file_ext(path) in JSON_LINES_EXTENSIONS
+
+def record_layout(input_file):
+    """Return (quotechar, has_header) for scanning the raw records of a delimited or JSON Lines file"""
+    return (None, False) if is_json_lines(input_file) else (b'"', True)
+
+def open_json_rows(input_file, end=None):
+    """Open a JSON array or JSON Lines file, returning (file, row iterator).
+
+    end limits a JSON Lines file to the lines before that byte position.
+    """
+    if is_json_lines(input_file):
+        json_file = open_input(input_file, 'rb')
+        return json_file, JsonLinesReader(json_file, end)
+    json_file = open_input(input_file, 'r', encoding='utf-8')
+    return json_file, JsonStreamReader(json_file)
+
+class JsonProjection:
+    """Compiled projection of JSON rows onto the selected flattened columns.
+
+    Gives the same values as flatten_json_object followed by picking the selected
+    columns, but only visits keys on the way to a selected column. Which keys of an
+    object to visit is worked out once per object shape (its prefix and key tuple)
+    and cached, so wide documents with few selected columns skip full flattening.
+
+    Calling it returns the list of values, or with output_names the object written
+    to JSON output (renamed keys). Non-object rows pass through as a single value.
+    """
+
+    max_shapes = 4096
+
+    def __init__(self, columns, output_names=None):
+        self.columns = list(columns)
+        self.output_names = list(output_names) if output_names is not None else None
+        self.selected = set(self.columns)
+        # Flattened names with a selected column below them
+        self.prefixes = {column[:i] for column in self.columns for i, char in enumerate(column) if char == '.'}
+        self.shapes = {}
+
+    def plan(self, prefix, keys):
+        """Compile the (key, name, selected, descend) steps for one object shape"""
+        steps = []
+        for key in keys:
+            name = f"{prefix}.{key}" if prefix else key
+            selected = name in self.selected
+            descend = name in self.prefixes or not name  # Children of an empty name keep their own names
+            if selected or descend:
+                steps.append((key, name, selected, descend))
+        if len(self.shapes) >= self.max_shapes:
+            self.shapes.clear()
+        self.shapes[(prefix, keys)] = steps
+        return steps
+
+    def collect(self, obj, prefix, values):
+        keys = tuple(obj)
+        steps = self.shapes.get((prefix, keys))
+        if steps is None:
+            steps = self.plan(prefix, keys)
+        for key, name, selected, descend in steps:
+            value = obj[key]
+            if isinstance(value, dict):
+                if descend:
+                    self.collect(value, name, values)
+            elif selected:
+                if isinstance(value, list):
+                    # Lists are kept as their JSON text
+                    values[name] = json.dumps(value) if value else ''
+                else:
+                    values[name] = str(value) if value is not None else ''
+
+    def __call__(self, json_row):
+        if not isinstance(json_row, dict):
+            return json_row if self.output_names is not None else [str(json_row)]
+        values = {}
+        self.collect(json_row, '', values)
+        if self.output_names is None:
+            return [values.get(column, '') for column in self.columns]
+        return {output_name: values.get(column, '') for column, output_name in zip(self.columns, self.output_names)}
+
+# Delimiters offered by the GUI, tried when sniffing finds nothing plausible
+COMMON_DELIMITERS = ',\t;|*'
+
+class RowProjection:
+    """Column selection and renaming for parsed delimited rows, compiled once per run.
+
+    The selected indices become a single operator.itemgetter and whole blocks of
+    rows are projected in one comprehension. Rows too short for the selection are
+    padded with '' and longer rows are truncated, as the per-row bounds check did.
+    With output_names each row becomes a dict keyed by the (renamed) column names.
+    """
+
+    def __init__(self, indices, output_names=None):
+        self.indices = list(indices)
+        self.width = max(self.indices) + 1 if self.indices else 0
+        self.output_names = output_names
+        # Selecting every column in order needs no copy for rows of the header's width
+        self.identity = self.indices == list(range(len(self.indices)))
+        if len(self.indices) > 1:
+            self.getter = operator.itemgetter(*self.indices)
+        elif self.indices:
+            index = self.indices[0]
+            self.getter = lambda row: (row[index],)
+        else:
+            self.getter = lambda row: ()
+
+    def pad(self, row):
+        return [row[i] if i < len(row) else '' for i in self.indices]
+
+    def project_rows(self, rows):
+        width, getter, pad = self.width, self.getter, self.pad
+        if self.identity:
+            values = [row if len(row) == width else pad(row) for row in rows]
+        else:
+            values = [getter(row) if len(row) >= width else pad(row) for row in rows]
+        if self.output_names is not None:
+            names = self.output_names
+            return [dict(zip(names, row)) for row in values]
+        return values
+
+    def __call__(self, row):
+        return self.project_rows((row,))[0]
+
+ROW_BLOCK_SIZE = 1000  # Parsed rows projected and written together
+
+def offset_row_blocks(reader, counter, size=ROW_BLOCK_SIZE):
+    """Like row_blocks, yielding (rows, offsets) with the input offset just past each row.
+
+    counter is the LineCounter or JsonLinesReader being read, whose offset is
+    past the last row it has produced.
+    """
+    rows, offsets = [], []
+    for row in reader:
+        rows.append(row)
+        offsets.append(counter.offset)
+        if len(rows) == size:
+            yield rows, offsets
+            rows, offsets = [], []
+    if rows:
+        yield rows, offsets
+
+def row_blocks(reader, size=ROW_BLOCK_SIZE):
+    """Group the rows of a csv.reader into lists of up to size rows"""
+    return iter(lambda: list(itertools.islice(reader, size)), [])
+
+def sort_key(value):
+    """Sort key for a column value: numbers in numeric order, then everything else as text"""
+    try:
+        number = float(value)
+    except ValueError:
+        return (1, value)
+    if number != number:  # NaN would break the ordering
+        return (1, value)
+    return (0, number)
+
+def approx_size(value):
+    """Rough in-memory size in bytes of a parsed row (str, list, tuple or dict of them)"""
+    if isinstance(value, str):
+        return 50 + len(value)
+    if isinstance(value, (list, tuple)):
+        return 56 + 8 * len(value) + sum(approx_size(item) for item in value)
+    if isinstance(value, dict):
+        return 64 + 100 * len(value) + sum(approx_size(item) for item in value.values())
+    return 32
+
+class ExternalSorter:
+    """Sort rows by key within a memory budget, spilling sorted runs to disk.
+
+    add() buffers (key, row, partition key) entries until their estimated size
+    reaches memory_limit bytes, then sorts the buffer and pickles it as a run in
+    a temporary folder under temp_dir. sorted_blocks() k-way merges the runs with
+    heapq.merge (merging in several passes when there are more than max_merge)
+    and yields (rows, partition keys) blocks in order. The sort is stable.
+    """
+
+    max_merge = 64  # Runs merged at once, bounding the open files
+    sample_stride = 16  # Every n-th row is measured for the memory estimate
+
+    def __init__(self, memory_limit, temp_dir=None, reverse=False):
+        self.memory_limit = memory_limit
+        self.reverse = reverse
+        self.temp_dir = tempfile.mkdtemp(prefix=".sort_", dir=temp_dir)
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.runs = []
+        self.run_count = 0
+        self.open_files = []
+
+    def add(self, sort_keys, rows, keys=None):
+        keys = keys if keys is not None else itertools.repeat(None)
+        entries = list(zip(sort_keys, rows, keys))
+        # Rows are measured on a sample; each entry also holds its key and tuples
+        sampled = sum(approx_size(row) for _, row, _ in entries[::self.sample_stride])
+        self.buffered_bytes += sampled * self.sample_stride + 160 * len(entries)
+        self.buffer.extend(entries)
+        if self.buffered_bytes >= self.memory_limit:
+            self.spill()
+
+    def spill(self):
+        """Sort the buffer and write it out as a run"""
+        self.buffer.sort(key=operator.itemgetter(0), reverse=self.reverse)
+        self.runs.append(self.write_run(self.buffer))
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def write_run(self, entries):
+        self.run_count += 1
+        path = os.path.join(self.temp_dir, f"run_{self.run_count}.pickle")
+        with open(path, 'wb') as f:
+            entries = iter(entries)
+            while True:
+                block = list(itertools.islice(entries, ROW_BLOCK_SIZE))
+                if not block:
+                    break
+                pickle.dump(block, f, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def read_run(self, path):
+        with open(path, 'rb', buffering=1024 * 1024) as f:
+            self.open_files.append(f)
+            try:
+                while True:
+                    try:
+                        block = pickle.load(f)
+                    except EOFError:
+                        break
+                    yield from block
+            finally:
+                self.open_files.remove(f)
+
+    def merge(self, runs):
+        return heapq.merge(*(self.read_run(path) for path in runs), key=operator.itemgetter(0), reverse=self.reverse)
+
+    def sorted_blocks(self):
+        if not self.runs:
+            # Everything fit in memory
+            self.buffer.sort(key=operator.itemgetter(0), reverse=self.reverse)
+            entries = iter(self.buffer)
+        else:
+            if self.buffer:
+                self.spill()
+            runs = self.runs
+            while len(runs) > self.max_merge:
+                # Merge groups of runs into longer runs until one k-way merge can take them all
+                merged = []
+                for i in range(0, len(runs), self.max_merge):
+                    group = runs[i:i + self.max_merge]
+                    merged.append(self.write_run(self.merge(group)))
+                    for path in group:
+                        os.remove(path)
+                runs = merged
+            entries = self.merge(runs)
+
+        while True:
+            block = list(itertools.islice(entries, ROW_BLOCK_SIZE))
+            if not block:
+                break
+            yield [entry[1] for entry in block], [entry[2] for entry in block]
+
+    def close(self):
+        for f in list(self.open_files):
+            f.close()
+        self.buffer = []
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+END_OF_BLOCKS = object()  # Queued by a pipeline stage after its last block
+
+class RowPipeline:
+    """Run the reader, transform and writer stages of a split concurrently.
+
+    The reader (iterating blocks) and the transform run on their own threads and
+    hand blocks on through queues of at most depth blocks, so a stage that gets
+    ahead waits until the next one catches up (backpressure). The writer runs on
+    the calling thread. Setting cancel_event stops all three stages at the next
+    block; an error in any stage stops the others and is re-raised. The busy
+    time of each stage is kept in stage_times.
+
+    The stages share the GIL, so only their I/O waits overlap: the pipeline helps
+    on slow or network storage and gains nothing when the split is CPU-bound.
+    """
+
+    depth = 4
+
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+        self.stop = threading.Event()
+        self.error = None
+        self.stage_times = {'read': 0.0, 'transform': 0.0, 'write': 0.0}
+
+    def stopping(self):
+        return self.stop.is_set() or self.cancel_event.is_set()
+
+    def put(self, out_queue, item):
+        """Queue item for the next stage, waiting while the queue is full; False once stopping"""
+        while not self.stopping():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, in_queue):
+        """Take the next item from the previous stage; None once stopping"""
+        while not self.stopping():
+            try:
+                return in_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def reader(self, blocks, out_queue):
+        clock = time.perf_counter
+        try:
+            blocks = iter(blocks)
+            while True:
+                start = clock()
+                block = next(blocks, END_OF_BLOCKS)
+                self.stage_times['read'] += clock() - start
+                if not self.put(out_queue, block) or block is END_OF_BLOCKS:
+                    break
+        except BaseException as e:
+            self.error = e
+            self.stop.set()
+
+    def transformer(self, transform, in_queue, out_queue):
+        clock = time.perf_counter
+        try:
+            while True:
+                block = self.get(in_queue)
+                if block is None:
+                    break
+                if block is not END_OF_BLOCKS:
+                    start = clock()
+                    block = transform(block)
+                    self.stage_times['transform'] += clock() - start
+                if not self.put(out_queue, block) or block is END_OF_BLOCKS:
+                    break
+        except BaseException as e:
+            self.error = e
+            self.stop.set()
+
+    def run(self, blocks, transform, write):
+        """Feed blocks through transform (None to skip that stage) and write.
+
+        Returns False if the pipeline stopped before the last block.
+        """
+        clock = time.perf_counter
+        read_queue = queue.Queue(self.depth)
+        threads = [threading.Thread(target=self.reader, args=(blocks, read_queue), daemon=True)]
+        if transform is None:
+            write_queue = read_queue
+        else:
+            write_queue = queue.Queue(self.depth)
+            threads.append(threading.Thread(target=self.transformer, args=(transform, read_queue, write_queue),
+                                            daemon=True))
+        for thread in threads:
+            thread.start()
+        completed = False
+        try:
+            while True:
+                block = self.get(write_queue)
+                if block is None:
+                    break
+                if block is END_OF_BLOCKS:
+                    completed = True
+                    break
+                start = clock()
+                write(block)
+                self.stage_times['write'] += clock() - start
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        if self.error is not None:
+            raise self.error
+        return completed
+
+def read_samples(input_file, sample_size=16384, samples=4):
+    """Return text from the start of the file plus whole lines from evenly spaced points through it.
+
+    Compressed files cannot be entered at an offset, so only their start is sampled.
+    """
+    with open_input(input_file, 'rb') as f:
+        head = f.read(sample_size)
+        chunks = [head]
+        size = os.path.getsize(input_file)
+        if not is_compressed(input_file) and size > sample_size * samples:
+            for k in range(1, samples):
+                f.seek(size * k // samples)
+                chunk = f.read(sample_size)
+                # Keep only whole lines: drop the partial line at each end of the window
+                start, end = chunk.find(b'\n') + 1, chunk.rfind(b'\n') + 1
+                if 0 < start < end:
+                    chunks.append(chunk[start:end])
+    if len(chunks) > 1 and b'\n' in head and not head.endswith(b'\n'):
+        chunks[0] = head[:head.rfind(b'\n') + 1]
+    return [chunk.decode('utf-8', errors='ignore') for chunk in chunks]
+
+def sniff_dialect(input_file, sample_size=16384, samples=4):
+    """Sniff the delimiter of a delimited file, returned as {'delimiter'}.
+
+    Lines from several points in the file are sniffed together, so a start that
+    happens to be unrepresentative does not decide the dialect alone. Falls back to
+    sniffing the start only, then to ','.
+    """
+    chunks = read_samples(input_file, sample_size, samples)
+    for sample in ("".join(chunks), chunks[0]):
+        try:
+            dialect = csv.Sniffer().sniff(sample)
+            if dialect.delimiter.isalnum():
+                # A letter or digit is never a real delimiter - retry with the usual ones
+                dialect = csv.Sniffer().sniff(sample, delimiters=COMMON_DELIMITERS)
+            return {'delimiter': dialect.delimiter}
+        except csv.Error:
+            continue
+    return {'delimiter': ','}
+
+def detect_delimiter(input_file, sample_size=16384):
+    """Sniff the field delimiter of a delimited file, falling back to ','"""
+    try:
+        return sniff_dialect(input_file, sample_size)['delimiter']
+    except Exception:
+        return ','
+
+SCHEMA_CACHE_VERSION = 2  # 2: the unused quotechar is no longer stored
+
+class SchemaCache:
+    """Detected dialect and columns of input files, saved as JSON (the GUI keeps it in its config directory).
+
+    Entries are keyed by absolute path and are only used while the file's size and
+    mtime are unchanged, so reopening a large file skips detection entirely. The
+    least recently used entries are dropped beyond max_entries.
+    """
+
+    max_entries = 500
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = None
+
+    def load(self):
+        if self.entries is None:
+            self.entries = {}
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == SCHEMA_CACHE_VERSION:
+                    self.entries = data['entries']
+            except (OSError, ValueError, KeyError, AttributeError):
+                pass  # Missing or unreadable - start empty
+        return self.entries
+
+    @staticmethod
+    def fingerprint(input_file):
+        stat = os.stat(input_file)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, input_file):
+        entry = self.load().get(os.path.abspath(input_file))
+        if entry is None or entry['fingerprint'] != self.fingerprint(input_file):
+            return None
+        entry['used'] = time.time()
+        return entry['schema']
+
+    def put(self, input_file, schema):
+        entries = self.load()
+        entries[os.path.abspath(input_file)] = {
+            'fingerprint': self.fingerprint(input_file),
+            'used': time.time(),
+            'schema': schema,
+        }
+        for key in sorted(entries, key=lambda k: entries[k]['used'])[:max(0, len(entries) - self.max_entries)]:
+            del entries[key]
+        self.save()
+
+    def save(self):
+        # Written to a temporary file first so a crash never leaves a truncated cache
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SCHEMA_CACHE_VERSION, 'entries': self.entries}, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass  # The cache is only an optimization
+
+def detect_schema(input_file, cache=None):
+    """Return {'delimiter', 'columns'} for an input file, using and filling cache (a SchemaCache)"""
+    schema = cache.get(input_file) if cache is not None else None
+    if schema is None:
+        if file_ext(input_file) in JSON_EXTENSIONS:
+            schema = {'delimiter': None, 'columns': get_json_header(input_file)}
+        else:
+            schema = sniff_dialect(input_file)
+            schema['columns'] = get_header(input_file, schema['delimiter'])
+        if cache is not None:
+            cache.put(input_file, schema)
+    return schema
+
+def flatten_json_keys(obj, parent_key='', sep='.'):
+    """Flatten nested JSON object keys with dot notation, preserving order"""
+    keys = []  # Use list to preserve order
+
+    if isinstance(obj, dict):
+        for key, value in obj.items():  # dict.items() preserves insertion order in Python 3.7+
+            new_key = f"{parent_key}{sep}{key}" if parent_key else key
+            keys.append(new_key)
+
+            # Recursively flatten nested objects
+            if isinstance(value, dict):
+                keys.extend(flatten_json_keys(value, new_key, sep))
+            elif isinstance(value, list) and value and isinstance(value[0], dict):
+                # Handle arrays of objects by flattening the first object
+                keys.extend(flatten_json_keys(value[0], new_key, sep))
+
+    return keys
+
+def flatten_json_object(obj, parent_key='', sep='.'):
+    """Flatten a nested JSON object into a flat dictionary"""
+    flattened = {}
+
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            new_key = f"{parent_key}{sep}{key}" if parent_key else key
+
+            if isinstance(value, dict):
+                flattened.update(flatten_json_object(value, new_key, sep))
+            elif isinstance(value, list):
+                # Convert lists to string representation
+                flattened[new_key] = json.dumps(value) if value else ''
+            else:
+                flattened[new_key] = str(value) if value is not None else ''
+    else:
+        flattened[parent_key] = str(obj) if obj is not None else ''
+
+    return flattened
+
+def get_json_header(input_file, sample_size=101):
+    """Collect ordered column keys from the first rows of a JSON file without loading it whole"""
+    ordered_keys = []
+    seen_keys = set()
+
+    json_file, rows = open_json_rows(input_file)
+    with json_file:
+        # Keys of the first object establish the order, additional keys from
+        # the next 100 objects are appended to the end
+        for index, item in enumerate(rows):
+            if index >= sample_size:
+                break
+            if isinstance(item, dict):
+                for key in flatten_json_keys(item):
+                    if key not in seen_keys:
+                        ordered_keys.append(key)
+                        seen_keys.add(key)
+
+    return ordered_keys
+
+def extract_rows(input_file, first_row, last_row, output_file, include_header=True, delimiter=None,
+                 progress_callback=None, cancel_event=None):
+    """Copy data rows first_row..last_row (1-based, inclusive) of a delimited or JSON Lines file to output_file.
+
+    Records are copied raw. With a current sidecar index the copy seeks straight to
+    the block holding first_row instead of scanning from the start of the file; a
+    missing or stale index is rebuilt and saved first. progress_callback gets
+    'analyzing' events with the rows indexed so far, then 'progress' events with the
+    'percentage' of the range copied. Returns the rows written, or None when
+    cancelled (the output is removed).
+    """
+    if is_compressed(input_file):
+        raise ValueError("Row ranges cannot be extracted from a compressed file without decompressing it.")
+    delimiter = delimiter or (',' if is_json_lines(input_file) else detect_delimiter(input_file))
+    def emit(event):
+        if progress_callback:
+            progress_callback(event)
+
+    index = RecordIndex.load(input_file, delimiter)
+    if index is None:
+        index = RecordIndex.build(input_file, cancel_event,
+                                  on_block=lambda rows: emit({'type': 'analyzing', 'rows': rows}))
+        if index is None:
+            return None
+        index.save(input_file, delimiter)
+
+    first_row = max(first_row, 1)
+    last_row = min(last_row, index.total_rows)
+    if last_row < first_row:
+        raise ValueError(f"Row range is empty - the file has {index.total_rows:,} data rows.")
+
+    start = index.row_offset(input_file, first_row - 1)
+    end = index.row_offset(input_file, last_row)
+    with open(input_file, 'rb') as infile, open(output_file, 'wb') as outfile:
+        if include_header:
+            outfile.write(index.header_record)
+        infile.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            chunk = infile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            outfile.write(chunk)
+            remaining -= len(chunk)
+            emit({'type': 'progress', 'percentage': (end - start - remaining) * 100 / (end - start)})
+    if cancel_event is not None and cancel_event.is_set():
+        os.remove(output_file)
+        return None
+    return last_row - first_row + 1
+
+MANIFEST_VERSION = 1
+
+def verify_manifest(manifest_path, max_workers=None):
+    """Check the parts listed in a split manifest against their recorded sizes and checksums.
+
+    Parts are hashed on a thread pool (hashlib releases the GIL while hashing),
+    so large part sets verify in parallel. Returns (file name, problem) for every
+    part that does not match - an empty list when all of them do.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    folder = os.path.dirname(os.path.abspath(manifest_path))
+    algorithm = manifest['checksum']
+
+    def check(part):
+        path = os.path.join(folder, part['file'])
+        hasher = hashlib.new(algorithm)
+        try:
+            size = os.path.getsize(path)
+            if size != part['bytes']:
+                return part['file'], f"is {size:,} bytes, expected {part['bytes']:,}"
+            with open(path, 'rb') as part_file:
+                for chunk in iter(functools.partial(part_file.read, 1024 * 1024), b''):
+                    hasher.update(chunk)
+        except OSError as e:
+            return part['file'], f"cannot be read ({e.strerror})"
+        if hasher.hexdigest() != part[algorithm]:
+            return part['file'], f"{algorithm} checksum does not match"
+        return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        return [problem for problem in executor.map(check, manifest['parts']) if problem is not None]
+
+PART_NAME = re.compile(r'^(.+)_(\d+)(\.[A-Za-z0-9]+(?:\.(?:gz|bz2|xz))?|)$')  # {base}_{n}{ext}
+COPY_CHUNK = 64 * 1024 * 1024  # Bytes per kernel copy call, so joins can report progress and be cancelled
+KERNEL_COPY_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                      errno.EBADF, errno.ENOTSOCK, errno.EPERM}
+
+def find_parts(part_file):
+    """Return every part of the split that part_file ({base}_{n}{ext}) belongs to, in part order"""
+    folder, name = os.path.split(os.path.abspath(part_file))
+    match = PART_NAME.match(name)
+    if not match:
+        raise ValueError(f"{name} is not named like a split part ({{base}}_{{n}}{{ext}}).")
+    base, _, ext = match.groups()
+
+    parts = {}
+    for path in glob.glob(os.path.join(glob.escape(folder), glob.escape(base) + '_*' + glob.escape(ext))):
+        other = PART_NAME.match(os.path.basename(path))
+        if other and other.group(1) == base and other.group(3) == ext:
+            parts[int(other.group(2))] = path
+    numbers = sorted(parts)
+    for number in range(numbers[0], numbers[-1] + 1):
+        if number not in parts:
+            raise ValueError(f"Part {base}_{number}{ext} is missing.")
+    return [parts[number] for number in numbers]
+
+class RangeCopier:
+    """Append byte ranges of files to an unbuffered output file.
+
+    os.copy_file_range is tried first (the data stays in the kernel, and reflink
+    file systems can share the blocks), then os.sendfile, then a plain read/write
+    loop. A method the OS or file system refuses is not tried again.
+    """
+
+    def __init__(self, out_file):
+        self.out_file = out_file
+        self.methods = [name for name in ('copy_file_range', 'sendfile') if hasattr(os, name)]
+
+    def copy(self, in_file, start, length):
+        """Copy length bytes of in_file from offset start; returns the bytes copied (fewer at end of file)"""
+        in_fd, out_fd = in_file.fileno(), self.out_file.fileno()
+        copied = 0
+        while self.methods and copied < length:
+            try:
+                if self.methods[0] == 'copy_file_range':
+                    count = os.copy_file_range(in_fd, out_fd, length - copied, start + copied)
+                else:
+                    count = os.sendfile(out_fd, in_fd, start + copied, length - copied)
+            except OSError as e:
+                if e.errno not in KERNEL_COPY_ERRORS:
+                    raise
+                self.methods.pop(0)
+                continue
+            if count == 0:
+                return copied
+            copied += count
+
+        in_file.seek(start + copied)
+        while copied < length:
+            chunk = in_file.read(min(length - copied, 1024 * 1024))
+            if not chunk:
+                break
+            self.write(chunk)
+            copied += len(chunk)
+        return copied
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[self.out_file.write(view):]
+
+def json_array_bounds(part_file):
+    """Return (start, end) of the elements inside the top-level array of an uncompressed JSON part"""
+    with open(part_file, 'rb') as f:
+        head = f.read(64)
+        stripped = head.lstrip(b'\xef\xbb\xbf \t\r\n')
+        if not stripped.startswith(b'['):
+            raise ValueError(f"{os.path.basename(part_file)} does not hold a JSON array.")
+        start = len(head) - len(stripped) + 1
+        size = f.seek(0, io.SEEK_END)
+        f.seek(max(start, size - 64))
+        tail = f.read().rstrip(b' \t\r\n')
+        if not tail.endswith(b']'):
+            raise ValueError(f"{os.path.basename(part_file)} does not hold a JSON array.")
+        end = max(start, size - 64) + len(tail) - 1
+        f.seek(start)
+        if end - start <= 4096 and not f.read(end - start).strip():
+            return start, start  # Empty array
+    return start, end
+
+def join_parts(parts, output_file, strip_headers=None, progress_callback=None, cancel_event=None):
+    """Join split parts back into one file and return the bytes written.
+
+    parts is a list of part files in order (see find_parts), all of the same format.
+    Delimited parts after the first lose their header record when strip_headers is
+    true; with None it is stripped when every part starts with the same record.
+    JSON array parts are merged into one array and JSON Lines parts concatenated.
+    Uncompressed segments are copied inside the kernel; compressed parts are
+    decompressed through Python. progress_callback gets 'progress' events with the
+    'part' being joined of 'parts', the 'bytes' written and the 'percentage' of the
+    parts' bytes on disk consumed. A cancelled join removes its output and returns None.
+    """
+    if not parts:
+        raise ValueError("There are no parts to join.")
+    output_path = os.path.realpath(output_file)
+    if any(os.path.realpath(part) == output_path for part in parts):
+        raise ValueError("The joined file cannot overwrite one of its parts.")
+    kind = file_ext(parts[0])
+    if any(file_ext(part) != kind for part in parts):
+        raise ValueError("All parts must have the same file format.")
+    json_array = kind == '.json'
+
+    headers = [b''] * len(parts)
+    if kind not in JSON_EXTENSIONS and strip_headers is not False:
+        for i, part in enumerate(parts):
+            with open_input(part, 'rb') as f:
+                headers[i] = CsvRecordScanner(f).read_record()
+        if strip_headers is None:
+            strip_headers = len(parts) > 1 and headers[0] != b'' and headers.count(headers[0]) == len(headers)
+
+    sizes = [os.path.getsize(part) for part in parts]
+    total_size = sum(sizes) or 1
+
+    def emit(number, position):
+        """Report progress through part number, position bytes into its file on disk"""
+        if progress_callback:
+            consumed = sum(sizes[:number - 1]) + position
+            progress_callback({'type': 'progress', 'part': number, 'parts': len(parts), 'bytes': written,
+                               'percentage': min(100, consumed * 100 / total_size)})
+
+    written = 0
+    elements = False  # Whether the merged JSON array has an element yet
+    ends_with_newline = True
+    with open(output_file, 'wb', buffering=0) as out:
+        copier = RangeCopier(out)
+        if json_array:
+            copier.write(b'[')
+            written += 1
+
+        for number, part in enumerate(parts, 1):
+            if cancel_event and cancel_event.is_set():
+                break
+            emit(number, 0)
+            skip = len(headers[number - 1]) if strip_headers and number > 1 else 0
+
+            if is_compressed(part):
+                # The decompressed length is unknown up front, so the closing bracket of a
+                # JSON part (and any whitespace after it) is held back until the end
+                with open_input(part, 'rb') as f:
+                    f.read(skip)
+                    pending = b''
+                    opened = started = False
+                    for chunk in iter(functools.partial(f.read, 1024 * 1024), b''):
+                        data = pending + chunk
+                        pending = b''
+                        if json_array:
+                            if not opened:
+                                data = data.lstrip(b'\xef\xbb\xbf \t\r\n')
+                                if not data:
+                                    continue
+                                if not data.startswith(b'['):
+                                    raise ValueError(f"{os.path.basename(part)} does not hold a JSON array.")
+                                data, opened = data[1:], True
+                            body = data.rstrip(b' \t\r\n')
+                            data, pending = body[:-1], data[max(len(body) - 1, 0):]
+                            if not started:
+                                data = data.lstrip(b' \t\r\n')
+                                if not data:
+                                    continue
+                                if elements:
+                                    copier.write(b',')
+                                    written += 1
+                                started = elements = True
+                        elif not started:
+                            if not data:
+                                continue
+                            if not ends_with_newline:
+                                copier.write(b'\n')
+                                written += 1
+                            started = True
+                        if data:
+                            copier.write(data)
+                            written += len(data)
+                            ends_with_newline = data.endswith(b'\n')
+                        emit(number, input_position(f))
+                        if cancel_event and cancel_event.is_set():
+                            break
+                    if json_array and not pending.startswith(b']') and not (cancel_event and cancel_event.is_set()):
+                        raise ValueError(f"{os.path.basename(part)} does not hold a JSON array.")
+                continue
+
+            with open(part, 'rb') as f:
+                if json_array:
+                    start, end = json_array_bounds(part)
+                    if start == end:
+                        continue
+                    if elements:
+                        copier.write(b',')
+                        written += 1
+                    elements = True
+                else:
+                    start, end = skip, os.fstat(f.fileno()).st_size
+                    if start == end:
+                        continue
+                    if not ends_with_newline:
+                        copier.write(b'\n')
+                        written += 1
+                    f.seek(end - 1)
+                    ends_with_newline = f.read(1) == b'\n'
+                while start < end:
+                    if cancel_event and cancel_event.is_set():
+                        break
+                    count = copier.copy(f, start, min(end - start, COPY_CHUNK))
+                    if count == 0:
+                        break
+                    start += count
+                    written += count
+                    emit(number, start)
+
+        if json_array:
+            copier.write(b']')
+            written += 1
+
+    if cancel_event and cancel_event.is_set():
+        os.remove(output_file)
+        return None
+    emit(len(parts), sizes[-1])
+    return written
+
+def get_header(input_file, delimiter=None):
+    """Return the column names of a delimited or JSON input file"""
+    if file_ext(input_file) in JSON_EXTENSIONS:
+        return get_json_header(input_file)
+    with open_input(input_file, 'r', newline='', encoding='utf-8') as f:
+        return next(csv.reader(f, delimiter=delimiter or detect_delimiter(input_file)))
+
+class SplitOptions:
+    """Settings for one split job - the headless equivalent of the GUI form.
+
+    mode is "size" (value in MB), "rows" (value rows per file) or "files" (value
+    output files). With partition_by, rows are routed to separate parts per value
+    of that column and the size or row limit applies within each value. With
+    sort_by, rows are sorted on that column (numbers numerically, then text) by an
+    external merge sort using about sort_memory_mb of memory. With checkpoint, a
+    resume point is saved as the split runs, and resume continues a cancelled or
+    crashed split from it. With incremental, only the records appended to the input
+    since the previous incremental run are split, into parts numbered after that
+    run's. With manifest, {base}_manifest.json lists every part's rows, size,
+    checksum (computed as it is written) and source byte range. Unset delimiters
+    are sniffed from the input, an unset output directory is "split_files" next to
+    the input, and an unset output extension keeps the input's.
+    """
+
+    def __init__(self, input_file, mode="size", value=1, output_dir=None, file_extension=None,
+                 delimiter=None, input_delimiter=None, quote_mode=csv.QUOTE_MINIMAL,
+                 selected_columns=None, column_renames=None, include_header=True,
+                 single_pass=True, parallel=False, create_log=True, workers=None, use_index=False,
+                 compression=None, size_target="uncompressed", profile=False, pipeline=False,
+                 partition_by=None, max_open_files=256, sort_by=None, sort_descending=False, sort_memory_mb=256,
+                 checkpoint=False, resume=False, checkpoint_interval=10.0, incremental=False,
+                 manifest=False, checksum="sha256"):
+        input_ext = file_ext(input_file)
+        if input_ext not in SUPPORTED_INPUT_EXTENSIONS:
+            raise ValueError(f"Unsupported input file type '{input_ext}'")
+        if mode not in ("size", "rows", "files"):
+            raise ValueError(f"Unknown split mode '{mode}'")
+        if int(value) <= 0:
+            raise ValueError("Split value must be a positive number")
+        if compression is not None and compression not in COMPRESSION_MODULES:
+            raise ValueError(f"Unknown output compression '{compression}'")
+        if size_target not in ("uncompressed", "compressed"):
+            raise ValueError(f"Unknown size target '{size_target}'")
+        if checksum not in CHECKSUM_ALGORITHMS:
+            raise ValueError(f"Unknown checksum '{checksum}'")
+        if partition_by and mode == "files":
+            raise ValueError("Partitioned splits need a size or row limit per file, not a number of files")
+        if incremental:
+            if mode == "files":
+                raise ValueError("Incremental splits need a size or row limit per file, not a number of files")
+            if input_ext == '.json' or is_compressed(input_file):
+                raise ValueError("Incremental splits need uncompressed delimited or JSON Lines input, "
+                                 "which can be appended to")
+            if partition_by or sort_by:
+                raise ValueError("Incremental splits cannot be sorted or partitioned")
+            if resume:
+                raise ValueError("Incremental splits continue from their own state file and cannot resume a checkpoint")
+
+        self.input_file = input_file
+        self.mode = mode
+        self.value = int(value)
+        self.output_dir = output_dir or os.path.join(os.path.dirname(input_file), "split_files")
+        self.file_extension = (file_extension or input_ext).lower()
+        if input_delimiter is None:
+            input_delimiter = ',' if input_ext in JSON_EXTENSIONS else detect_delimiter(input_file)
+        self.input_delimiter = input_delimiter
+        self.delimiter = delimiter or input_delimiter
+        self.quote_mode = quote_mode
+        self.selected_columns = list(selected_columns) if selected_columns else []
+        self.column_renames = dict(column_renames or {})
+        self.include_header = include_header
+        self.single_pass = single_pass
+        self.parallel = parallel
+        self.create_log = create_log
+        self.workers = workers or os.cpu_count() or 1
+        self.use_index = use_index  # Read/write a row-offset sidecar index for delimited input
+        self.compression = compression  # Compress each output part ('.gz', '.bz2' or '.xz')
+        self.size_target = size_target  # Whether size mode limits the compressed or uncompressed part
+        self.profile = profile  # Capture cProfile/tracemalloc reports of the run
+        self.pipeline = pipeline  # Read, transform and write on separate threads (sequential runs)
+        self.partition_by = partition_by or None  # Input column whose values get their own parts
+        self.max_open_files = max(1, int(max_open_files))  # Open part files kept while partitioning
+        self.sort_by = sort_by or None  # Input column the rows are sorted on before splitting
+        self.sort_descending = sort_descending
+        self.sort_memory_mb = max(1, int(sort_memory_mb))  # Memory for sorted runs before they spill to disk
+        self.checkpoint = checkpoint  # Save a resume point every checkpoint_interval seconds
+        self.resume = resume  # Continue from the checkpoint left by a cancelled or crashed run
+        self.checkpoint_interval = checkpoint_interval
+        self.incremental = incremental  # Split only what was appended since the last incremental run
+        self.manifest = manifest  # Write a JSON manifest of the parts with their checksums
+        self.checksum = checksum  # Checksum algorithm for the manifest ('sha256' or 'blake2b')
+
+# Phases of a run timed by SplitEngine, in log order
+PHASES = ('analysis', 'parsing', 'projection', 'sorting', 'serialization', 'writes', 'rotation')
+
+class SplitResult:
+    """Outcome of a SplitEngine run"""
+
+    def __init__(self, status, output_dir, input_rows, per_file_row_counts, elapsed, metrics=None):
+        self.status = status  # "completed" or "cancelled"
+        self.output_dir = output_dir
+        self.input_rows = input_rows
+        self.per_file_row_counts = per_file_row_counts
+        self.output_rows = sum(per_file_row_counts)
+        self.elapsed = elapsed
+        self.metrics = metrics  # Per-phase timings, as written to {base}_metrics.json
+
+    @property
+    def parts(self):
+        return len(self.per_file_row_counts)
+
+    @property
+    def cancelled(self):
+        return self.status == "cancelled"
+
+    @property
+    def passed(self):
+        """True when the run completed and every input row landed in an output file"""
+        return self.status == "completed" and self.input_rows == self.output_rows
+
+class ProgressSnapshot:
+    """Latest progress of a running split, shared between the worker and a poller.
+
+    The worker publishes each update by replacing state with a new dict - one
+    reference assignment, so there is no lock and a reader always sees a whole
+    update. Readers poll at their own rate (the GUI uses 10 Hz), so the cost of
+    reporting does not grow with the number of rows.
+    """
+
+    def __init__(self):
+        self.state = {
+            'version': 0,           # Incremented by every update
+            'phase': None,          # "analyzing", "streaming" or "merging"
+            'analyzed_rows': 0,     # Rows counted so far by the pre-pass
+            'total_rows': None,     # Input rows, once known
+            'rows': 0,
+            'percentage': 0.0,
+            'output_path': '',
+            'part_num': 0,
+        }
+
+    def update(self, **fields):
+        # Only the worker thread writes, so copying the current state is safe
+        state = dict(self.state, **fields)
+        state['version'] += 1
+        self.state = state
+
+class SplitEngine:
+    """Split one file according to a SplitOptions, without any GUI.
+
+    Progress is published to self.progress (a ProgressSnapshot) for polling, and
+    reported by calling progress_callback(event) with a dict whose 'type' is one of:
+
+        phase       'phase' is "analyzing" (row-counting pre-pass), "streaming" or
+                    "merging" (writing the merged runs of a sorted split)
+        analyzing   'rows' counted so far during the pre-pass
+        total_rows  'rows' in the input once known
+        progress    'rows', 'total_rows', 'percentage', 'output_path', 'part_num'
+        notice      informational 'message' for the user
+
+    'analyzing' and 'progress' events are coalesced to one per progress_interval
+    seconds. The callback runs on the thread calling run(). Setting cancel_event
+    (or calling cancel()) stops the run at the next row block; errors are raised
+    to the caller.
+    """
+
+    progress_interval = 0.1
+
+    def __init__(self, options, progress_callback=None, cancel_event=None):
+        self.options = options
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event or threading.Event()
+        self.progress = ProgressSnapshot()
+        self.last_progress_event = 0.0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def emit(self, event_type, **fields):
+        if self.progress_callback:
+            fields['type'] = event_type
+            self.progress_callback(fields)
+
+    def throttle(self, force=False):
+        """Check whether a coalesced 'analyzing'/'progress' event is due"""
+        now = time.monotonic()
+        if force or now - self.last_progress_event >= self.progress_interval:
+            self.last_progress_event = now
+            return True
+        return False
+
+    def update_analyzing(self, rows):
+        self.progress.update(analyzed_rows=rows)
+        if self.progress_callback and self.throttle():
+            self.emit('analyzing', rows=rows)
+
+    def update_total_rows(self):
+        self.progress.update(total_rows=self.total_rows)
+        self.emit('total_rows', rows=self.total_rows)
+
+    def update_progress(self, current_row, current_filename, part_num=1, bytes_read=None, force=False):
+        """Report progress; in single-pass mode it is measured in input bytes consumed"""
+        if bytes_read is not None and self.input_size:
+            percentage = min(100, (bytes_read / self.input_size) * 100)
+        elif self.total_rows > 0:
+            percentage = min(100, (current_row / self.total_rows) * 100)
+        else:
+            return
+        self.progress.update(rows=current_row, percentage=percentage, output_path=current_filename, part_num=part_num)
+        if self.progress_callback and self.throttle(force):
+            self.emit('progress', rows=current_row, total_rows=self.total_rows, percentage=percentage,
+                      output_path=current_filename, part_num=part_num)
+
+    def run(self):
+        """Split the input and return a SplitResult.
+
+        With options.profile the run is captured with cProfile and tracemalloc
+        (on this thread - parallel workers are not profiled) and the reports are
+        written next to the parts.
+        """
+        if not self.options.profile:
+            return self.split_file()
+
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        profiler.enable()
+        try:
+            return self.split_file()
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.write_profile(profiler, snapshot, peak)
+
+    def split_file(self):
+        opts = self.options
+        self.start_time = time.time()
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.worker_time = 0.0  # Busy time summed over parallel worker processes or pipeline stages
+        self.cancelled = False
+        self.part_num = 1
+        self.base_filename = os.path.splitext(os.path.basename(strip_compression(opts.input_file)[0]))[0]
+        self.output_extension = opts.file_extension + (opts.compression or '')
+        self.input_rows = 0
+        self.per_file_row_counts = []
+        self.part_paths = None  # Set when the parts are not simply {base}_1..n (partitioned runs)
+        self.first_part = 1  # Number of the first part this run writes (later for incremental runs)
+        self.start_offset = 0  # Input offset an incremental run starts from (0 for the beginning)
+        self.previous_rows = 0  # Rows split by earlier incremental runs
+        self.part_stats = []  # Size and checksum of each part, as recorded by the writers
+        self.part_sources = None  # Input byte range of each part, when manifest sources are mapped
+        self.source_ranges = None
+        self.output_path = ""
+
+        os.makedirs(opts.output_dir, exist_ok=True)
+
+        # Detect input file type
+        input_ext = file_ext(opts.input_file)
+        self.is_json_input = input_ext in JSON_EXTENSIONS
+        self.is_json_lines_input = input_ext in JSON_LINES_EXTENSIONS
+
+        # Parallel mode scans delimited or JSON Lines input for record boundaries up front
+        # (which also yields the row total) and splits byte ranges in a process pool
+        # (compressed input cannot be entered at arbitrary offsets, so it is always read sequentially)
+        self.is_compressed_input = is_compressed(opts.input_file)
+        self.use_parallel = (opts.parallel and input_ext != '.json' and opts.file_extension != ".json"
+                             and not self.is_compressed_input and not opts.partition_by and not opts.sort_by
+                             and not opts.checkpoint and not opts.resume and not opts.incremental)
+
+        # Single-pass mode reads the input exactly once; "Number of Files" mode
+        # needs the row total up front, so it always runs the counting pass (incremental
+        # runs never count, as only the appended records are split)
+        self.single_pass = (opts.single_pass or opts.incremental) and opts.mode != "files" and not self.use_parallel
+        self.use_pipeline = opts.pipeline and not self.use_parallel
+        self.input_size = os.path.getsize(opts.input_file)
+
+        # First pass: count total rows for progress tracking
+        analysis_start = time.perf_counter()
+        self.analyze()
+        self.phase_times['analysis'] = time.perf_counter() - analysis_start
+
+        # If cancelled during analysis, still write log
+        if self.cancelled:
+            return self.finish("cancelled", "during analysis", self.total_rows)
+
+        mode, size_or_rows = opts.mode, opts.value
+        if mode == "files":
+            # Calculate rows per file for even distribution
+            num_files = size_or_rows
+            if num_files > self.total_rows:
+                # If requesting more files than rows, limit to one row per file
+                num_files = self.total_rows
+                self.emit('notice', message=f"Requested {size_or_rows} files, but only {self.total_rows} rows available. Creating {num_files} files instead.")
+
+            # Calculate rows per file (using ceiling to ensure all rows are included)
+            size_or_rows = math.ceil(self.total_rows / num_files) if num_files else 1
+            # Switch to rows mode for the actual splitting
+            mode = "rows"
+
+        # Second pass: actual splitting with progress tracking and column filtering
+        self.mode = mode
+        self.max_size_bytes = size_or_rows * 1024 * 1024 if mode == "size" else None
+        self.max_rows = size_or_rows if mode == "rows" else None
+        self.setup_checkpoint()
+        self.setup_incremental()
+        # Parts come from one contiguous input range unless rows are reordered or regrouped
+        # (JSON arrays are decoded as text, so their byte offsets are not known)
+        self.map_sources = (opts.manifest and not opts.partition_by and not opts.sort_by
+                            and not (self.is_json_input and not self.is_json_lines_input))
+
+        split_start = time.perf_counter()
+        if self.use_parallel:
+            self.split_parallel()
+        elif self.is_json_input:
+            self.split_json_input()
+        elif self.range_copy:
+            self.split_ranges()
+        elif self.raw_passthrough:
+            self.split_raw()
+        else:
+            self.split_csv_input()
+        self.split_time = time.perf_counter() - split_start
+
+        # Parsing covers reading, decoding and parsing the input: the split time
+        # (summed worker or stage time when parallel or pipelined) less the measured phases
+        busy_time = self.worker_time or self.split_time
+        self.phase_times['parsing'] = max(0.0, busy_time - sum(
+            self.phase_times[phase] for phase in ('projection', 'serialization', 'writes', 'rotation')))
+
+        if self.incremental is not None:
+            # A cancelled run's parts are complete too, so the next run continues after them
+            self.save_incremental()
+            if not self.input_rows and not self.cancelled:
+                self.emit('notice', message="No records were appended to the input since the last incremental run.")
+        if self.cancelled:
+            return self.finish("cancelled", "during file splitting", self.input_rows)
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+
+        # In single-pass mode the total is only known once the input is consumed
+        if self.single_pass:
+            self.total_rows = self.input_rows
+            self.update_total_rows()
+
+        # Final progress update
+        self.update_progress(self.total_rows, self.output_path, self.part_num, force=True)
+
+        return self.finish("completed")
+
+    def finish(self, status, cancel_phase=None, input_rows=None):
+        """Write the log and metrics file and build the SplitResult"""
+        opts = self.options
+        self.elapsed = time.time() - self.start_time
+        input_rows = self.input_rows if input_rows is None else input_rows
+        metrics = self.get_metrics(status, input_rows)
+        if status == "cancelled":
+            self.write_cancellation_log(input_rows, self.per_file_row_counts, cancel_phase)
+        elif opts.create_log:
+            # Create log file for successful completion
+            self.write_completion_log()
+        if opts.create_log:
+            self.write_metrics(metrics)
+        if opts.manifest:
+            self.write_manifest(status, input_rows)
+        return SplitResult(status, opts.output_dir, input_rows, self.per_file_row_counts, self.elapsed, metrics)
+
+    def get_metrics(self, status, input_rows):
+        """Machine-readable summary of the run with per-phase timings"""
+        elapsed = self.elapsed or 1e-9
+        phases = {}
+        for phase in PHASES:
+            seconds = self.phase_times[phase]
+            rows = self.counted_rows() if phase == "analysis" else input_rows
+            phases[phase] = {'seconds': seconds, 'rows_per_sec': rows / seconds if seconds and rows else None}
+        return {
+            'status': status,
+            'input_file': self.options.input_file,
+            'input_bytes': self.input_size,
+            'input_rows': input_rows,
+            'output_rows': sum(self.per_file_row_counts),
+            'parts': len(self.per_file_row_counts),
+            'elapsed_seconds': self.elapsed,
+            'rows_per_sec': input_rows / elapsed,
+            'mb_per_sec': self.input_size / (1024 * 1024) / elapsed,
+            'parallel_workers': self.options.workers if self.use_parallel else None,
+            'pipeline': self.use_pipeline,
+            'partition_by': self.options.partition_by,
+            'sort_by': self.options.sort_by,
+            'incremental_from': self.start_offset if self.options.incremental else None,
+            'phases': phases,
+        }
+
+    def counted_rows(self):
+        """Rows counted by the analysis phase - none in single-pass mode"""
+        return 0 if self.single_pass else self.total_rows
+
+    def write_manifest(self, status, input_rows):
+        """Write {base}_manifest.json: each part's rows, bytes, checksum and source byte range"""
+        opts = self.options
+        parts = []
+        for i, (path, rows, stats) in enumerate(zip(self.get_part_paths(), self.per_file_row_counts, self.part_stats)):
+            parts.append({
+                'file': os.path.basename(path),
+                'rows': rows,
+                'bytes': stats['bytes'],
+                'uncompressed_bytes': stats['uncompressed_bytes'],
+                opts.checksum: stats['checksum'],
+                'source_bytes': self.part_sources[i] if self.part_sources is not None else None,
+            })
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'status': status,
+            'input_file': opts.input_file,
+            'input_bytes': self.input_size,
+            'input_rows': input_rows,
+            'checksum': opts.checksum,
+            'parts': parts,
+        }
+        path = os.path.join(opts.output_dir, f"{self.base_filename}_manifest.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    def write_metrics(self, metrics):
+        path = os.path.join(self.options.output_dir, f"{self.base_filename}_metrics.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, indent=2)
+
+    def write_profile(self, profiler, snapshot, peak):
+        """Write the cProfile statistics and the top memory allocation sites of a profiled run"""
+        base = os.path.join(self.options.output_dir, f"{self.base_filename}_profile")
+        profiler.dump_stats(base + ".pstats")
+        with open(base + ".txt", 'w', encoding='utf-8') as f:
+            f.write(f"Profile of splitting {self.options.input_file}\n\n")
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats('cumulative').print_stats(30)
+            stats.sort_stats('tottime').print_stats(30)
+            f.write(f"Peak traced memory: {peak:,} bytes\n\nTop allocation sites:\n")
+            for stat in snapshot.statistics('lineno')[:25]:
+                f.write(f"{stat}\n")
+
+    def write_log_timings(self, log_file):
+        """Write the elapsed time and per-phase timing lines shared by both log kinds"""
+        rows = self.input_rows or self.total_rows
+        log_file.write(f"Elapsed Time: {self.elapsed:.2f} s ({rows / (self.elapsed or 1e-9):,.0f} rows/s)\n")
+        if self.use_parallel:
+            note = " (summed across worker processes)"
+        elif self.use_pipeline:
+            note = " (summed across pipeline stages)"
+        else:
+            note = ""
+        log_file.write(f"Phase Timings{note}:\n")
+        for phase in PHASES:
+            seconds = self.phase_times[phase]
+            phase_rows = self.counted_rows() if phase == "analysis" else rows
+            rate = f", {phase_rows / seconds:,.0f} rows/s" if seconds and phase_rows else ""
+            log_file.write(f"  {phase.capitalize()}: {seconds:.3f} s{rate}\n")
+
+    def analyze(self):
+        """Read the header, decide the split strategy and (unless single-pass) count the rows"""
+        opts = self.options
+        phase = "streaming" if self.single_pass else "analyzing"
+        self.progress.update(phase=phase)
+        self.emit('phase', phase=phase)
+        self.total_rows = 0
+        self.raw_passthrough = False
+        self.range_copy = False
+        self.record_index = None
+
+        if self.is_json_input:
+            # Handle JSON input - stream the rows so memory stays constant
+            self.header = get_json_header(opts.input_file)
+            self.header_indices = None
+
+            # Filter header to only include selected columns, preserving order
+            if opts.selected_columns:
+                selected = set(opts.selected_columns)
+                self.filtered_header = [col for col in self.header if col in selected]
+            else:
+                self.filtered_header = self.header
+
+            if self.is_json_lines_input:
+                # One record per line, so rows are counted by the fast record scan
+                self.find_records()
+            elif not self.single_pass:
+                json_file, rows = open_json_rows(opts.input_file)
+                with json_file:
+                    self.count_rows(rows)
+        else:
+            # Handle CSV/TXT/DAT input
+            with open_input(opts.input_file, 'r', newline='', encoding='utf-8') as infile:
+                reader = csv.reader(infile, delimiter=opts.input_delimiter)
+                self.header = next(reader, None)  # Read and store header
+                if self.header is None:
+                    raise ValueError("The input file is empty.")
+
+                # Filter header to only include selected columns
+                if opts.selected_columns:
+                    selected = set(opts.selected_columns)
+                    self.header_indices = [i for i, col in enumerate(self.header) if col in selected]
+                else:
+                    self.header_indices = list(range(len(self.header)))
+                self.filtered_header = [self.header[i] for i in self.header_indices]
+
+                # Raw passthrough: with no delimiter, column, rename or quoting change the
+                # records can be copied byte-for-byte instead of being parsed and re-serialized
+                self.raw_passthrough = (
+                    opts.file_extension not in JSON_EXTENSIONS
+                    and opts.delimiter == opts.input_delimiter
+                    and self.header_indices == list(range(len(self.header)))
+                    and self.get_output_column_names(self.filtered_header) == self.header
+                    and opts.quote_mode == csv.QUOTE_MINIMAL
+                    and not opts.partition_by
+                    and not opts.sort_by
+                )
+
+                # Plain TXT/DAT size splits with nothing to change are copied part by part
+                # inside the kernel (sequential runs without compression, checksums or resume state)
+                self.range_copy = (
+                    self.raw_passthrough and opts.mode == "size" and not self.use_parallel
+                    and file_ext(opts.input_file) in ('.txt', '.dat') and not self.is_compressed_input
+                    and not opts.compression and not opts.manifest
+                    and not opts.checkpoint and not opts.resume and not opts.incremental
+                )
+
+                # Raw size splits are fully determined by input bytes, so the parallel scan
+                # can record the exact sequential part boundaries as it goes
+                part_bytes = None
+                if ((self.use_parallel or self.range_copy) and self.raw_passthrough and opts.mode == "size"
+                        and not (opts.compression and opts.size_target == "compressed")):
+                    header_size = len(header_line_bytes(opts.input_file)) if opts.include_header else 0
+                    part_bytes = opts.value * 1024 * 1024 - header_size
+                    part_bytes = part_bytes if part_bytes > 0 else None
+                self.range_copy = self.range_copy and part_bytes is not None
+                self.part_bytes = part_bytes
+
+                # Count only data rows (excluding header)
+                self.find_records(part_bytes, lambda: self.count_rows(reader))
+
+        # Apply column renames to the filtered header for output
+        self.output_header = self.get_output_column_names(self.filtered_header)
+
+        if opts.partition_by and opts.partition_by not in self.header:
+            raise ValueError(f"Partition column '{opts.partition_by}' was not found in the input.")
+        if opts.sort_by and opts.sort_by not in self.header:
+            raise ValueError(f"Sort column '{opts.sort_by}' was not found in the input.")
+
+        if self.cancel_event.is_set():
+            self.cancelled = True
+
+        # Update total rows (unknown until the end in single-pass mode)
+        if not self.single_pass and not self.cancelled:
+            self.update_total_rows()
+
+    def find_records(self, part_bytes=None, count_rows=None):
+        """Get the row total from the sidecar index, a fast record scan or count_rows()
+
+        Without count_rows (JSON Lines) the record scan is the counting pass.
+        """
+        opts = self.options
+        use_index = opts.use_index and not self.is_compressed_input and not opts.incremental
+        if use_index:
+            self.record_index = RecordIndex.load(opts.input_file, opts.input_delimiter, part_bytes)
+            if self.record_index is not None and self.record_index.part_bytes != part_bytes:
+                self.record_index = None  # Current, but without this part size's boundaries
+
+        if self.record_index is not None:
+            # The sidecar already knows the total, so nothing needs counting
+            self.single_pass = False
+        elif self.use_parallel or (not self.single_pass and (use_index or self.range_copy or count_rows is None)):
+            self.record_index = RecordIndex.build(
+                opts.input_file, self.cancel_event,
+                self.update_analyzing, part_bytes=part_bytes)
+            if self.record_index is not None and use_index:
+                self.record_index.save(opts.input_file, opts.input_delimiter)
+        elif not self.single_pass:
+            count_rows()
+
+        if self.record_index is not None:
+            self.total_rows = self.record_index.total_rows
+
+    def count_rows(self, rows):
+        """Counting pre-pass; stops early when cancelled"""
+        for _ in rows:
+            if self.cancel_event.is_set():
+                self.cancelled = True
+                break
+            self.total_rows += 1
+            if self.total_rows % 1000 == 0:
+                self.update_analyzing(self.total_rows)
+
+    def get_output_column_names(self, original_columns):
+        """Get the output column names (renamed if applicable) for the given original columns"""
+        return [self.options.column_renames.get(col, col) for col in original_columns]
+
+    def get_part_counts(self, writer):
+        """Set per_file_row_counts from a closed PartWriter.
+
+        A part left empty by a cancellation is not counted as a created file.
+        """
+        per_file_row_counts = list(writer.part_row_counts)
+        if isinstance(writer, PartitionedWriter):
+            self.part_paths = writer.part_paths
+        elif self.cancelled and per_file_row_counts and per_file_row_counts[-1] == 0:
+            per_file_row_counts.pop()
+        self.per_file_row_counts = per_file_row_counts
+        self.part_stats = writer.part_stats[:len(per_file_row_counts)]
+        self.output_path, self.part_num = writer.output_path, writer.part_num
+
+    def writer_limits(self):
+        """Part size/row limits and output compression shared by every PartWriter"""
+        return {
+            'max_size_bytes': self.max_size_bytes,
+            'max_rows': self.max_rows,
+            'compression': self.options.compression,
+            'size_target': self.options.size_target,
+            'checksum': self.options.checksum if self.options.manifest else None,
+        }
+
+    def close_writer(self, writer, projection_time, write_calls):
+        """Close a sequential run's PartWriter and record its part counts and phase timings"""
+        close_start = time.perf_counter()
+        writer.close()
+        write_calls += time.perf_counter() - close_start
+        self.get_part_counts(writer)
+        if self.source_ranges is not None:
+            self.source_ranges.note(writer.part_row_counts)
+            self.part_sources = self.source_ranges.ranges[:len(self.per_file_row_counts)]
+        if self.incremental is not None:
+            self.writer_state = writer.checkpoint()
+        for phase, seconds in writer_phase_times(writer, projection_time, write_calls).items():
+            self.phase_times[phase] += seconds
+
+    def new_csv_writer(self):
+        opts = self.options
+        writer = CsvPartWriter(opts.output_dir, self.base_filename, opts.file_extension, opts.delimiter, opts.quote_mode,
+                               header_row=self.output_header if opts.include_header else None,  # Renamed header
+                               **self.writer_limits())
+        self.prepare_writer(writer, True)
+        return writer
+
+    def new_json_writer(self):
+        # Opened lazily, so no empty JSON part is created
+        writer_class = JsonLinesPartWriter if self.options.file_extension in JSON_LINES_EXTENSIONS else JsonPartWriter
+        writer = writer_class(self.options.output_dir, self.base_filename, self.options.file_extension,
+                              **self.writer_limits())
+        self.prepare_writer(writer, False)
+        return writer
+
+    def new_partitioned_writer(self):
+        """PartitionedWriter whose per-key writers share one compression pool and open lazily"""
+        opts = self.options
+        executor = None
+        if opts.compression:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        # Smaller buffers, as one is held for every open key
+        limits = dict(self.writer_limits(), buffer_size=64 * 1024, executor=executor)
+        if opts.file_extension in JSON_EXTENSIONS:
+            writer_class = JsonLinesPartWriter if opts.file_extension in JSON_LINES_EXTENSIONS else JsonPartWriter
+            def new_writer(base_filename):
+                return writer_class(opts.output_dir, base_filename, opts.file_extension, **limits)
+        else:
+            header_row = self.output_header if opts.include_header else None
+            def new_writer(base_filename):
+                return CsvPartWriter(opts.output_dir, base_filename, opts.file_extension, opts.delimiter,
+                                     opts.quote_mode, header_row=header_row, **limits)
+        return PartitionedWriter(self.base_filename, new_writer, opts.max_open_files, executor)
+
+    def split_signature(self):
+        """Split settings that must not change between runs that continue the same parts"""
+        opts = self.options
+        return {
+            'mode': opts.mode,
+            'value': opts.value,
+            'file_extension': opts.file_extension,
+            'delimiter': opts.delimiter,
+            'input_delimiter': opts.input_delimiter,
+            'quote_mode': opts.quote_mode,
+            'selected_columns': opts.selected_columns,
+            'column_renames': opts.column_renames,
+            'include_header': opts.include_header,
+            'compression': opts.compression,
+            'size_target': opts.size_target,
+            'manifest': opts.manifest,
+            'checksum': opts.checksum,
+        }
+
+    def checkpoint_signature(self):
+        """What must not change between a checkpointed run and its resumption"""
+        return dict(self.split_signature(), input=SchemaCache.fingerprint(self.options.input_file))
+
+    def setup_checkpoint(self):
+        """Prepare checkpointing and, when resuming, load the state to continue from"""
+        opts = self.options
+        self.checkpoint = self.resume_state = self.checkpoint_offset = None
+        if not (opts.checkpoint or opts.resume):
+            return
+        if opts.incremental:
+            self.emit('notice', message="Incremental splits record their progress in their state file, "
+                                        "so no checkpoints are written.")
+            return
+        if opts.partition_by or opts.sort_by or (self.is_json_input and not self.is_json_lines_input):
+            # Only these runs write every row in input order, at a known input offset
+            if opts.resume:
+                raise ValueError("Only unsorted, unpartitioned splits of delimited or JSON Lines input can be resumed.")
+            self.emit('notice', message="Checkpoints are only written for unsorted, unpartitioned splits of "
+                                        "delimited or JSON Lines input. This split will run without them.")
+            return
+
+        self.checkpoint = Checkpoint(os.path.join(opts.output_dir, f"{self.base_filename}_checkpoint.json"),
+                                     self.checkpoint_signature(), opts.checkpoint_interval)
+        if opts.resume:
+            state = self.checkpoint.load()
+            if state is None:
+                raise ValueError(f"There is no checkpoint to resume from in {opts.output_dir}.")
+            if state['signature'] != self.checkpoint.signature:
+                raise ValueError("The checkpoint was saved for a different version of the input file or "
+                                 "different split settings, so the split cannot be resumed.")
+            self.resume_state = state
+            self.checkpoint_offset = state['input_offset']
+            self.input_rows = state['input_rows']
+
+    def setup_incremental(self):
+        """Prepare an incremental run, continuing after the input offset and part saved by the last one"""
+        opts = self.options
+        self.incremental = self.input_end = None
+        if not opts.incremental:
+            return
+
+        self.incremental = Checkpoint(os.path.join(opts.output_dir, f"{self.base_filename}_incremental.json"),
+                                      self.split_signature())
+        # Only whole records are split, so a record still being appended is left for the next run
+        state = self.incremental.load()
+        state_name = os.path.basename(self.incremental.path)
+        if state is None:
+            if os.path.exists(self.incremental.path):
+                # Starting over would overwrite the parts of the earlier runs
+                raise ValueError(f"{state_name} cannot be read. Delete it to split the input from the start.")
+            self.input_end = complete_records_end(opts.input_file)
+            return
+        if state['signature'] != self.incremental.signature:
+            raise ValueError(f"The split settings have changed since the last incremental run. "
+                             f"Delete {state_name} to start the parts over with the new settings.")
+        offset = state['input_offset']
+        if (offset > os.path.getsize(opts.input_file)
+                or input_prefix_digest(opts.input_file, offset) != state['input_prefix']):
+            raise ValueError(f"The input file was truncated or replaced since the last incremental run. "
+                             f"Delete {state_name} to split it from the start.")
+        self.input_end = complete_records_end(opts.input_file, offset)
+
+        # Continue like a resumed run whose last part is already finished, counting this run's parts only
+        self.resume_state = dict(state, writer=dict(state['writer'], part_row_counts=[], part_stats=[]))
+        self.checkpoint_offset = self.start_offset = offset
+        self.first_part = state['writer']['part_num'] + 1
+        self.previous_rows = state['input_rows']
+
+    def save_incremental(self):
+        """Record where the next incremental run starts - past the last record written, after the last part"""
+        if self.checkpoint_offset is None:
+            return  # Nothing has been split yet
+        self.incremental.save({
+            'input_offset': self.checkpoint_offset,
+            'input_prefix': input_prefix_digest(self.options.input_file, self.checkpoint_offset),
+            'input_rows': self.previous_rows + self.input_rows,
+            'writer': self.writer_state,
+        })
+
+    def prepare_writer(self, writer, open_part):
+        """Restore a resumed run's writer, or open the first part now if open_part.
+
+        Incremental runs always open parts lazily, so a run without new records creates none.
+        """
+        if self.resume_state is not None:
+            writer.restore(self.resume_state['writer'])
+        elif open_part and self.incremental is None:
+            writer.open_part()
+
+    def resume_input(self, seek):
+        """When resuming, seek(offset) to the first record not yet written"""
+        if self.resume_state is not None:
+            seek(self.resume_state['input_offset'])
+
+    def track_sources(self, start):
+        """Start mapping parts to input byte ranges from start, the offset of the first record to be read"""
+        if self.map_sources:
+            state = self.resume_state and self.resume_state.get('sources')
+            self.source_ranges = SourceRanges(**state) if state else SourceRanges(start)
+
+    def record_written(self, writer, end, count=0, offset_of=None):
+        """Note the input offset reached by the rows written so far, saving a checkpoint when one is due.
+
+        offset_of(i) is the offset past record i of the count records just written.
+        """
+        if self.source_ranges is not None:
+            self.source_ranges.note(writer.part_row_counts, count, offset_of, end)
+        if self.checkpoint is not None or self.incremental is not None:
+            self.checkpoint_offset = end
+            if self.checkpoint is not None and self.checkpoint.due():
+                self.save_checkpoint(writer)
+
+    def tracks_offsets(self):
+        """Whether the input offset past every written row is needed (checkpointed, incremental or mapped runs)"""
+        return self.checkpoint is not None or self.incremental is not None or self.map_sources
+
+    def save_checkpoint(self, writer):
+        if self.checkpoint is not None and self.checkpoint_offset is not None:
+            self.checkpoint.save({'input_offset': self.checkpoint_offset, 'input_rows': self.input_rows,
+                                  'writer': writer.checkpoint(),
+                                  'sources': self.source_ranges.state() if self.source_ranges is not None else None})
+
+    def process_blocks(self, blocks, transform, write):
+        """Pass each block through transform (None to skip) and write, checking for cancellation.
+
+        Runs inline, or as a RowPipeline of threads when pipelining is on. Returns the
+        seconds spent in transform and in write.
+        """
+        if self.use_pipeline:
+            pipeline = RowPipeline(self.cancel_event)
+            if not pipeline.run(blocks, transform, write):
+                self.cancelled = True
+            self.worker_time = sum(pipeline.stage_times.values())
+            return pipeline.stage_times['transform'], pipeline.stage_times['write']
+
+        clock = time.perf_counter
+        transform_time = write_time = 0.0
+        for block in blocks:
+            if self.cancel_event.is_set():
+                self.cancelled = True
+                break
+            if transform is not None:
+                start = clock()
+                block = transform(block)
+                transform_time += clock() - start
+            start = clock()
+            write(block)
+            write_time += clock() - start
+        return transform_time, write_time
+
+    def split_parallel(self):
+        """Run split_byte_range over record-aligned byte ranges in a process pool"""
+        opts = self.options
+        record_index = self.record_index
+
+        # Row-based splits align ranges to whole parts so the output matches a sequential run exactly
+        target_bytes = max(self.input_size // (opts.workers * 4), 8 * 1024 * 1024)
+        if record_index.part_boundaries is not None:
+            byte_ranges = plan_part_ranges(record_index, target_bytes)
+        elif self.mode == "size":
+            # Transformed output size is not known up front; keep ranges several parts
+            # long so only each range's last part falls short of the size target
+            byte_ranges = plan_byte_ranges(opts.input_file, record_index.blocks,
+                                           max(target_bytes, 4 * self.max_size_bytes))
+        else:
+            byte_ranges = plan_byte_ranges(opts.input_file, record_index.blocks, target_bytes, align_rows=self.max_rows)
+
+        if len(byte_ranges) < 2:
+            # Too small to be worth a process pool
+            self.use_parallel = False
+            if self.raw_passthrough:
+                self.split_raw()
+            elif self.is_json_input:
+                self.split_json_input()
+            else:
+                self.split_csv_input()
+            return
+
+        task = {
+            'input_file': opts.input_file,
+            'output_dir': opts.output_dir,
+            'file_extension': opts.file_extension,
+            'limits': self.writer_limits(),
+            'include_header': opts.include_header,
+            'raw': self.raw_passthrough,
+            'header_record': record_index.header_record,
+            'input_delimiter': opts.input_delimiter,
+            'header_indices': self.header_indices,
+            'filtered_header': self.filtered_header,
+            'delimiter': opts.delimiter,
+            'quote_mode': opts.quote_mode,
+            'output_header': self.output_header,
+            'manifest': self.map_sources,
+        }
+        if self.map_sources:
+            self.part_sources = []
+        results = [None] * len(byte_ranges)
+        rows_done = 0
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=opts.workers) as executor:
+            try:
+                futures = {}
+                for index, (start, end, _) in enumerate(byte_ranges):
+                    range_task = dict(task, start=start, end=end, part_prefix=f"{self.base_filename}.range{index}")
+                    futures[executor.submit(split_byte_range, range_task)] = index
+
+                pending = set(futures)
+                while pending:
+                    done, pending = concurrent.futures.wait(pending, timeout=0.2,
+                                                            return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        index = futures[future]
+                        results[index] = future.result()
+                        rows_done += byte_ranges[index][2]
+                    self.update_progress(rows_done, f"{self.base_filename} (parallel)",
+                                         sum(len(result[0]) for result in results if result))
+
+                    if self.cancel_event.is_set() and pending:
+                        self.cancelled = True
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        for future in pending:
+                            if not future.cancelled() and future.exception() is None:
+                                results[futures[future]] = future.result()
+                        break
+            except BaseException:
+                # A failed range stops the others, and every range's temporary parts are removed
+                executor.shutdown(wait=True, cancel_futures=True)
+                self.remove_range_parts()
+                raise
+
+        # Rename worker parts to {base}_{n} in range order; after a cancellation only
+        # the unbroken run of completed leading ranges is kept
+        keep = True
+        for index, result in enumerate(results):
+            keep = keep and result is not None
+            if result is None:
+                continue
+            for part, (part_path, rows, stats) in enumerate(zip(result[0], result[1], result[3])):
+                if keep:
+                    self.output_path = os.path.join(opts.output_dir, f"{self.base_filename}_{len(self.per_file_row_counts) + 1}{self.output_extension}")
+                    os.replace(part_path, self.output_path)
+                    self.per_file_row_counts.append(rows)
+                    self.part_stats.append(stats)
+                    if self.part_sources is not None:
+                        self.part_sources.append(result[4][part])
+                else:
+                    os.remove(part_path)
+            if keep:
+                self.input_rows += byte_ranges[index][2]
+            # Phase timings are summed over the worker processes
+            self.worker_time += result[2]['total']
+            for phase in ('projection', 'serialization', 'writes', 'rotation'):
+                self.phase_times[phase] += result[2][phase]
+        self.part_num = len(self.per_file_row_counts)
+
+    def remove_range_parts(self):
+        """Delete the temporary {base}.range{n} parts left by the workers of a failed parallel split"""
+        pattern = os.path.join(glob.escape(self.options.output_dir), glob.escape(f"{self.base_filename}.range") + '*')
+        for path in glob.glob(pattern):
+            os.remove(path)
+
+    def split_json_input(self):
+        """Split JSON or JSON Lines input, converting to delimited output or re-chunking the objects"""
+        opts = self.options
+        is_json_format = opts.file_extension in JSON_EXTENSIONS
+        # Flattening is compiled once for the selected columns (renamed objects for JSON
+        # output, value lists for CSV/TXT/DAT)
+        project = JsonProjection(self.filtered_header, self.output_header if is_json_format else None)
+        project_key = JsonProjection([opts.partition_by]) if opts.partition_by else None
+        project_sort_key = JsonProjection([opts.sort_by]) if opts.sort_by else None
+
+        def read_blocks():
+            if self.tracks_offsets():
+                # Only JSON Lines input gets here - its reader counts the bytes of every line
+                blocks = offset_row_blocks(json_reader, json_reader)
+            else:
+                blocks = zip(row_blocks(iter(json_reader)), itertools.repeat(None))
+            for json_rows, offsets in blocks:
+                yield json_rows, input_position(json_input) if self.single_pass else None, offsets
+
+        def transform(block):
+            # Flatten the JSON objects onto the selected columns
+            json_rows, position, offsets = block
+            keys = [project_key(json_row)[0] for json_row in json_rows] if project_key else None
+            sort_keys = [sort_key(project_sort_key(json_row)[0]) for json_row in json_rows] if project_sort_key else None
+            return [project(json_row) for json_row in json_rows], keys, sort_keys, len(json_rows), position, offsets
+
+        # Process JSON input data a block of rows at a time
+        json_input, json_reader = open_json_rows(opts.input_file, self.input_end)
+        with json_input:
+            self.resume_input(json_input.seek)
+            if self.is_json_lines_input:
+                self.track_sources(json_input.tell())
+            self.write_blocks(read_blocks(), transform)
+
+    def split_ranges(self):
+        """Copy a plain TXT/DAT size split part by part with RangeCopier, so the data is never written from Python.
+
+        Part boundaries and row counts come from the record index when it holds them
+        for this part size. Otherwise the records are scanned once, replaying the
+        PartWriter size check, and each part is copied on a worker thread as soon as
+        its end is found - while its pages are still in the OS cache, and overlapping
+        with the scan of the next part.
+        """
+        opts = self.options
+        clock = time.perf_counter
+        # A run without an index records one as a by-product of the scan
+        blocks = [] if opts.use_index and self.record_index is None else None
+        boundaries = []
+        pending = collections.deque()  # (rows, end, output path, future) of parts being copied
+        wait_time = 0.0
+        split_start = clock()
+
+        def copy_part(infile, output_path, header, start, end):
+            copy_start = clock()
+            with open(output_path, 'wb', buffering=0) as outfile:
+                copier = RangeCopier(outfile)
+                copier.write(header)
+                size = len(header) + copier.copy(infile, start, end - start)
+            return size, clock() - copy_start
+
+        def collect(limit):
+            nonlocal wait_time
+            while len(pending) > limit:
+                rows, end, output_path, future = pending.popleft()
+                wait_start = clock()
+                size, seconds = future.result()
+                wait_time += clock() - wait_start
+                self.phase_times['writes'] += seconds
+                self.per_file_row_counts.append(rows)
+                self.part_stats.append({'bytes': size, 'uncompressed_bytes': size, 'checksum': None})
+                self.input_rows += rows
+                self.output_path, self.part_num = output_path, len(self.per_file_row_counts)
+                self.update_progress(self.input_rows, output_path, self.part_num, end if self.single_pass else None)
+
+        with open(opts.input_file, 'rb') as scan_file, open(opts.input_file, 'rb') as infile, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            if self.record_index is not None:
+                header_record = self.record_index.header_record
+                parts = self.indexed_parts(self.record_index)
+            else:
+                scanner = CsvRecordScanner(scan_file)
+                header_record = scanner.read_record()
+                parts = self.scanned_parts(scanner, blocks)
+            header = header_record if opts.include_header else b''
+
+            rows_before = 0
+            for part, (start, end, rows) in enumerate(parts):
+                if self.cancel_event.is_set():
+                    self.cancelled = True
+                    break
+                if part:
+                    boundaries.append((start, rows_before))
+                rows_before += rows
+                output_path = os.path.join(opts.output_dir, f"{self.base_filename}_{self.first_part + part}{self.output_extension}")
+                pending.append((rows, end, output_path,
+                                executor.submit(copy_part, infile, output_path, header, start, end)))
+                collect(1)  # One part copying while the next is found
+            collect(0)
+
+        # Busy time is the scan (less the waits for copies) plus the copies themselves
+        self.worker_time = clock() - split_start - wait_time + self.phase_times['writes']
+        if blocks is not None and not self.cancelled:
+            RecordIndex(header_record, blocks, boundaries, self.part_bytes).save(opts.input_file, opts.input_delimiter)
+
+    def indexed_parts(self, index):
+        """(start, end, rows) of every part, from an index holding the part boundaries"""
+        data_start = index.blocks[0][0] if index.blocks else len(index.header_record)
+        data_end = index.blocks[-1][1] if index.blocks else data_start
+        starts = [data_start] + [offset for offset, _ in index.part_boundaries]
+        ends = starts[1:] + [data_end]
+        rows_before = [0] + [rows for _, rows in index.part_boundaries] + [index.total_rows]
+        return [(start, end, rows_before[i + 1] - rows_before[i]) for i, (start, end) in enumerate(zip(starts, ends))]
+
+    def scanned_parts(self, scanner, blocks=None):
+        """Yield (start, end, rows) of every part, replaying the PartWriter size check over a record scan.
+
+        Input with no records still yields one empty part, as PartWriter opens the
+        first part up front. The scanned blocks are appended to blocks when given.
+        """
+        part_start = start = scanner.offset
+        remaining, rows, parts = self.part_bytes, 0, 0
+        for block in scanner.blocks():
+            if self.cancel_event.is_set():
+                self.cancelled = True
+                return
+            position = 0
+            if len(block.data) < remaining:
+                # The whole block falls inside the current part - its records are already counted
+                rows += block.count
+                remaining -= len(block.data)
+                position = len(block.data)
+            while position < len(block.data):
+                end, count = block.advance(position, min_bytes=remaining)
+                rows += count
+                if end - position >= remaining:
+                    yield part_start, start + end, rows
+                    part_start, remaining, rows = start + end, self.part_bytes, 0
+                    parts += 1
+                else:
+                    remaining -= end - position
+                position = end
+            if blocks is not None:
+                blocks.append((start, scanner.offset, block.count))
+            start = scanner.offset
+        if rows or not parts:
+            yield part_start, start, rows
+
+    def split_raw(self):
+        """Copy CSV/TXT/DAT records as raw bytes - no decode, parse or re-serialize.
+
+        Whole blocks of records are written at once; only part boundaries are located.
+        """
+        opts = self.options
+        with open_input(opts.input_file, 'rb') as infile:
+            scanner = CsvRecordScanner(infile, end=self.input_end)
+            header_record = scanner.read_record()
+            writer = PartWriter(opts.output_dir, self.base_filename, opts.file_extension,
+                                header=header_record if opts.include_header else b'', **self.writer_limits())
+            self.prepare_writer(writer, True)
+            if self.resume_state is not None:
+                self.resume_input(infile.seek)
+                scanner = CsvRecordScanner(infile, end=self.input_end)
+            self.track_sources(scanner.offset)
+
+            # A run without an index records one as a by-product of the copy
+            blocks = [] if (opts.use_index and self.record_index is None and self.resume_state is None
+                            and not opts.incremental) else None
+
+            def read_blocks():
+                start = scanner.offset
+                for block in scanner.blocks():
+                    yield block, start, scanner.offset, input_position(infile) if self.single_pass else None
+                    start = scanner.offset
+
+            def write(item):
+                block, start, end, position = item
+                writer.write_block(block)
+                self.input_rows += block.count
+                if blocks is not None:
+                    blocks.append((start, end, block.count))
+                self.update_progress(self.input_rows, writer.output_path, writer.part_num, position)
+                self.record_written(writer, end, block.count, lambda i: start + block.record_ends()[i])
+
+            _, write_calls = self.process_blocks(read_blocks(), None, write)
+            if self.cancelled:
+                self.save_checkpoint(writer)
+            self.close_writer(writer, 0.0, write_calls)
+
+        if blocks is not None and not self.cancelled:
+            RecordIndex(header_record, blocks).save(opts.input_file, opts.input_delimiter)
+
+    def split_csv_input(self):
+        """Parse CSV/TXT/DAT input and re-serialize the selected columns.
+
+        Rows are read, projected and written in blocks of ROW_BLOCK_SIZE.
+        """
+        opts = self.options
+        is_json_format = opts.file_extension in JSON_EXTENSIONS
+        # Column selection and renames are compiled once (renamed objects for JSON output)
+        project_rows = RowProjection(self.header_indices, self.output_header if is_json_format else None).project_rows
+        key_index = self.header.index(opts.partition_by) if opts.partition_by else None
+        sort_index = self.header.index(opts.sort_by) if opts.sort_by else None
+
+        def read_blocks():
+            blocks = offset_row_blocks(reader, lines) if lines else zip(row_blocks(reader), itertools.repeat(None))
+            for rows, offsets in blocks:
+                yield rows, input_position(infile) if self.single_pass else None, offsets
+
+        def transform(block):
+            # Filter rows to the selected columns, keeping each row's partition and sort keys
+            rows, position, offsets = block
+            keys = sort_keys = None
+            if key_index is not None:
+                keys = [row[key_index] if key_index < len(row) else '' for row in rows]
+            if sort_index is not None:
+                sort_keys = [sort_key(row[sort_index] if sort_index < len(row) else '') for row in rows]
+            return project_rows(rows), keys, sort_keys, len(rows), position, offsets
+
+        if not self.tracks_offsets():
+            infile = open_input(opts.input_file, 'r', newline='', encoding='utf-8')
+            lines = None
+        else:
+            # Checkpoints, incremental runs and manifest sources need the exact byte offset
+            # of each record, so lines are decoded here
+            infile = open_input(opts.input_file, 'rb')
+            lines = LineCounter(infile, end=self.input_end)
+        with infile:
+            reader = csv.reader(lines or infile, delimiter=opts.input_delimiter)
+            next(reader)  # Read and consume header row
+            if lines:
+                self.resume_input(lines.seek)
+                self.track_sources(lines.offset)
+
+            # Process all data rows (header was already consumed by next(reader))
+            self.write_blocks(read_blocks(), transform)
+
+    def write_blocks(self, blocks, transform):
+        """Write parsed input to the output parts.
+
+        transform turns each block into (output rows, partition keys, sort keys,
+        input rows, input position, input offset past each row), with None keys
+        when not partitioning or sorting and None offsets when they are not
+        needed. Sorted runs go through an ExternalSorter first, and its merged
+        output is written once the whole input has been read.
+        """
+        opts = self.options
+        method = 'write_objects' if opts.file_extension in JSON_EXTENSIONS else 'write_rows'
+        if opts.partition_by:
+            writer = self.new_partitioned_writer()
+            write = functools.partial(writer.write_rows, method=method)
+        else:
+            writer = self.new_json_writer() if method == 'write_objects' else self.new_csv_writer()
+            write_rows = getattr(writer, method)
+
+            def write(rows, keys):
+                write_rows(rows)
+        sorter = None
+        if opts.sort_by:
+            sorter = ExternalSorter(opts.sort_memory_mb * 1024 * 1024, opts.output_dir, opts.sort_descending)
+        sort_time = 0.0
+        clock = time.perf_counter
+
+        def consume(block):
+            nonlocal sort_time
+            rows, keys, sort_keys, count, position, offsets = block
+            # Count these as data rows (not header) - the writer rotates parts as needed
+            self.input_rows += count
+            if sorter is None:
+                self.update_progress(self.input_rows, writer.output_path, writer.part_num, position)
+                write(rows, keys)
+                if offsets:
+                    self.record_written(writer, offsets[-1], count, offsets.__getitem__)
+            else:
+                self.update_progress(self.input_rows, f"{self.base_filename} (sorting)", 0, position)
+                start = clock()
+                sorter.add(sort_keys, rows, keys)
+                sort_time += clock() - start
+
+        try:
+            projection_time, write_calls = self.process_blocks(blocks, transform, consume)
+            write_calls -= sort_time
+            if sorter is not None and not self.cancelled:
+                sort_time, merge_calls = self.write_sorted(sorter, writer, write, sort_time)
+                write_calls += merge_calls
+        finally:
+            if sorter is not None:
+                sorter.close()
+        if self.cancelled:
+            self.save_checkpoint(writer)
+        self.phase_times['sorting'] += sort_time
+        self.close_writer(writer, projection_time, write_calls)
+
+    def write_sorted(self, sorter, writer, write, sort_time):
+        """Stream the merged runs of sorter to write; returns the sort and write seconds"""
+        # The total is known once the input is consumed, so the merge reports progress by rows
+        if self.single_pass:
+            self.total_rows = self.input_rows
+            self.update_total_rows()
+        self.progress.update(phase="merging")
+        self.emit('phase', phase="merging")
+        clock = time.perf_counter
+        write_calls = 0.0
+        written = 0
+        blocks = sorter.sorted_blocks()
+        while True:
+            start = clock()
+            block = next(blocks, None)
+            sort_time += clock() - start
+            if block is None:
+                break
+            if self.cancel_event.is_set():
+                self.cancelled = True
+                break
+            rows, keys = block
+            start = clock()
+            write(rows, keys)
+            write_calls += clock() - start
+            written += len(rows)
+            self.update_progress(written, writer.output_path, writer.part_num)
+        return sort_time, write_calls
+
+    def get_part_paths(self):
+        """Paths of the created parts, in the order of per_file_row_counts"""
+        if self.part_paths is not None:
+            return self.part_paths
+        return [os.path.join(self.options.output_dir, f"{self.base_filename}_{self.first_part + i}{self.output_extension}")
+                for i in range(len(self.per_file_row_counts))]
+
+    def part_label(self, part_filename):
+        """File name shown after the part number in logs - only partitioned parts need one"""
+        return f" ({os.path.basename(part_filename)})" if self.part_paths is not None else ""
+
+    def write_log_settings(self, log_file):
+        """Write the output format and column selection lines shared by both log kinds"""
+        opts = self.options
+        log_file.write(f"Output Format: {opts.file_extension}\n")
+        if opts.compression:
+            log_file.write(f"Output Compression: {opts.compression} (size target: {opts.size_target})\n")
+        if opts.sort_by:
+            log_file.write(f"Sorted By: {opts.sort_by} ({'descending' if opts.sort_descending else 'ascending'})\n")
+        if opts.partition_by:
+            log_file.write(f"Partitioned By: {opts.partition_by}\n")
+        if opts.incremental:
+            log_file.write(f"Incremental Run: records from input byte {self.start_offset:,}\n")
+        if opts.file_extension not in JSON_EXTENSIONS:
+            log_file.write(f"Delimiter Used: '{opts.delimiter}'\n")
+            log_file.write(f"Quote Mode: {QUOTE_MODE_NAMES.get(opts.quote_mode, 'Standard')}\n")
+            log_file.write(f"Header Row Included: {'Yes' if opts.include_header else 'No'}\n")
+
+        # Log column filtering information
+        available_columns = self.header
+        selected_columns = opts.selected_columns or available_columns
+        if len(selected_columns) < len(available_columns):
+            excluded_columns = [col for col in available_columns if col not in selected_columns]
+            log_file.write(f"Columns Included: {len(selected_columns)} of {len(available_columns)}\n")
+            log_file.write(f"Included Columns: {', '.join(selected_columns)}\n")
+            log_file.write(f"Excluded Columns: {', '.join(excluded_columns)}\n")
+        else:
+            log_file.write(f"All Columns Included: {len(available_columns)}\n")
+        log_file.write(f"\n")
+
+    def write_cancellation_log(self, input_rows, per_file_row_counts, cancel_phase):
+        """Write log entry for cancelled operations"""
+        opts = self.options
+        if not opts.create_log:
+            return
+
+        log_path = os.path.join(opts.output_dir, "log.txt")
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        with open(log_path, 'a', encoding='utf-8') as log_file:
+            log_file.write(f"\n")
+            log_file.write(f"File Splitter Log - CANCELLED\n")
+            log_file.write(f"Timestamp: {timestamp}\n")
+            log_file.write(f"Input File: {opts.input_file}\n")
+            log_file.write(f"Input File Size: {self.input_size:,} bytes\n")
+            log_file.write(f"Operation cancelled {cancel_phase}\n")
+            log_file.write(f"Total Data Rows Processed: {input_rows:,}\n")
+            log_file.write(f"Partial Files Created: {len(per_file_row_counts)}\n")
+            self.write_log_settings(log_file)
+
+            # Log any partial files that were created
+            for i, (part_filename, row_count, stats) in enumerate(zip(self.get_part_paths(), per_file_row_counts, self.part_stats)):
+                if os.path.exists(part_filename):
+                    part_size = stats['bytes']
+                    log_file.write(f"Partial File {self.first_part + i}{self.part_label(part_filename)}: {row_count} data rows, {part_size:,} bytes\n")
+
+            log_file.write(f"\nTotal Data Rows in Partial Files: {sum(per_file_row_counts):,}\n")
+            log_file.write("Validation: FAIL ❌ (Operation Cancelled)\n")
+            self.write_log_timings(log_file)
+            log_file.write(f"\n============================================================\n")
+
+    def write_completion_log(self):
+        """Write log entry for successful completion"""
+        opts = self.options
+        log_path = os.path.join(opts.output_dir, "log.txt")
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        output_rows = sum(self.per_file_row_counts)
+
+        with open(log_path, 'a', encoding='utf-8') as log_file:
+            log_file.write(f"\n")
+            log_file.write(f"File Splitter Log\n")
+            log_file.write(f"Timestamp: {timestamp}\n")
+            log_file.write(f"Input File: {opts.input_file}\n")
+            log_file.write(f"Input File Size: {self.input_size:,} bytes\n")
+            log_file.write(f"Total Data Rows in Input File: {self.input_rows:,}\n")
+            log_file.write(f"Total Files Created: {len(self.per_file_row_counts)}\n")
+            self.write_log_settings(log_file)
+
+            # Sizes were recorded by the writers, so the parts are not stat'ed again
+            for i, (part_filename, row_count, stats) in enumerate(zip(self.get_part_paths(), self.per_file_row_counts, self.part_stats)):
+                part_size = stats['bytes']
+                log_file.write(f"File {self.first_part + i}{self.part_label(part_filename)}: {row_count} data rows, {part_size:,} bytes\n")
+
+            log_file.write(f"\nTotal Data Rows in Split Files: {output_rows:,}\n")
+            if self.input_rows == output_rows:
+                log_file.write("Validation: PASS ✅\n")
+            else:
+                log_file.write("Validation: FAIL ❌\n")
+            self.write_log_timings(log_file)
+            log_file.write(f"\n============================================================\n")
+
+def expand_inputs(patterns):
+    """Expand file paths and glob patterns into a de-duplicated list of supported input files"""
+    inputs = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if (os.path.isfile(path) and file_ext(path) in SUPPORTED_INPUT_EXTENSIONS
+                    and os.path.abspath(path) not in seen):
+                seen.add(os.path.abspath(path))
+                inputs.append(path)
+    return inputs
+
+def load_job_spec(spec_path):
+    """Read a JSON job-spec file into a list of SplitOptions.
+
+    The file holds either a list of jobs or {"defaults": {...}, "jobs": [...]}.
+    Each job is a dict of SplitOptions arguments whose "input_file" may be a glob
+    pattern (one job per match); relative paths are resolved against the spec's folder.
+    """
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    if isinstance(spec, list):
+        spec = {'jobs': spec}
+    base_dir = os.path.dirname(os.path.abspath(spec_path))
+
+    options = []
+    for job in spec.get('jobs', []):
+        job = dict(spec.get('defaults', {}), **job)
+        pattern = os.path.join(base_dir, job.pop('input_file'))
+        if job.get('output_dir'):
+            job['output_dir'] = os.path.join(base_dir, job['output_dir'])
+        for input_file in expand_inputs([pattern]):
+            options.append(SplitOptions(input_file, **job))
+    return options
+
+def run_batch_job(job_id, options, events, stop_event):
+    """Process-pool worker for BatchRunner: run one job, forwarding its events to the shared queue"""
+    # Polling the cross-process stop event costs an IPC round trip, so the engine
+    # checks a local event that a watcher thread mirrors from it
+    cancel_event = threading.Event()
+    finished = threading.Event()
+
+    def watch_stop():
+        while not finished.wait(0.2):
+            if stop_event.is_set():
+                cancel_event.set()
+                return
+
+    def forward(event):
+        # The engine coalesces progress events, so the queue is not flooded from tight loops
+        event['job_id'] = job_id
+        events.put(event)
+
+    if stop_event.is_set():
+        return None  # Batch cancelled before this job started
+    watcher = threading.Thread(target=watch_stop, daemon=True)
+    watcher.start()
+    events.put({'type': 'job_status', 'job_id': job_id, 'status': 'running'})
+    try:
+        return SplitEngine(options, forward, cancel_event).run()
+    finally:
+        finished.set()
+
+class BatchJob:
+    """One input of a batch and its current state"""
+
+    def __init__(self, job_id, options):
+        self.job_id = job_id
+        self.options = options
+        self.status = "queued"  # queued, running, completed, failed or cancelled
+        self.result = None
+        self.error = None
+
+class BatchRunner:
+    """Split many files on a bounded process pool.
+
+    Each job runs a SplitEngine in a worker process. A failing job is recorded as
+    "failed" and the rest carry on. progress_callback receives the engine events of
+    every job (tagged with 'job_id'), plus:
+
+        job_status  'job_id', 'status', plus 'error' for failures or 'rows'
+                    and 'parts' once a job has finished
+        batch       aggregate counts and throughput after each finished job
+    """
+
+    def __init__(self, options_list, max_workers=None, progress_callback=None, cancel_event=None):
+        self.jobs = [BatchJob(job_id, options) for job_id, options in enumerate(options_list)]
+        self.max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(self.jobs) or 1))
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event or threading.Event()
+        self.start_time = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def emit(self, event):
+        if self.progress_callback:
+            self.progress_callback(event)
+
+    def summary(self):
+        """Aggregate counts and throughput over the finished jobs"""
+        finished = [job for job in self.jobs if job.result is not None]
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        input_bytes = sum(os.path.getsize(job.options.input_file) for job in finished if job.status == "completed")
+        rows = sum(job.result.input_rows for job in finished)
+        return {
+            'type': 'batch',
+            'total': len(self.jobs),
+            'completed': sum(job.status == "completed" for job in self.jobs),
+            'failed': sum(job.status == "failed" for job in self.jobs),
+            'cancelled': sum(job.status == "cancelled" for job in self.jobs),
+            'rows': rows,
+            'bytes': input_bytes,
+            'elapsed': elapsed,
+            'rows_per_sec': rows / elapsed if elapsed else 0,
+            'mb_per_sec': input_bytes / (1024 * 1024) / elapsed if elapsed else 0,
+        }
+
+    def set_status(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        event = {'type': 'job_status', 'job_id': job.job_id, 'status': status}
+        if error:
+            event['error'] = error
+        if job.result is not None:
+            event['rows'] = job.result.input_rows
+            event['parts'] = job.result.parts
+        self.emit(event)
+
+    def drain(self, events):
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                return
+            if event['type'] == 'job_status':
+                self.jobs[event['job_id']].status = event['status']
+            self.emit(event)
+
+    def run(self):
+        """Run every job and return the list of BatchJobs"""
+        self.start_time = time.time()
+        with multiprocessing.Manager() as manager:
+            events = manager.Queue()
+            stop_event = manager.Event()
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {}
+                for job in self.jobs:
+                    # The batch pool is the parallelism; jobs must not start pools of their own
+                    job.options.parallel = False
+                    futures[executor.submit(run_batch_job, job.job_id, job.options, events, stop_event)] = job
+
+                pending = set(futures)
+                while pending:
+                    done, pending = concurrent.futures.wait(pending, timeout=0.1,
+                                                            return_when=concurrent.futures.FIRST_COMPLETED)
+                    self.drain(events)
+                    for future in done:
+                        job = futures[future]
+                        if future.cancelled():
+                            self.set_status(job, "cancelled")
+                            continue
+                        try:
+                            job.result = future.result()
+                        except Exception as e:
+                            self.set_status(job, "failed", str(e) or type(e).__name__)
+                        else:
+                            self.set_status(job, job.result.status if job.result else "cancelled")
+                        self.emit(self.summary())
+
+                    if self.cancel_event.is_set() and not stop_event.is_set():
+                        stop_event.set()
+                        for future in pending:
+                            future.cancel()
+                self.drain(events)
+        return self.jobs
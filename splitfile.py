@@ -1,13 +1,17 @@
 import os
-import csv
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, Menu, simpledialog
 import webbrowser
 import time
 import json
-import math
 import platform
+import splitengine
+
+# Output compression choices shown in the form, mapped to SplitOptions.compression
+COMPRESSION_CHOICES = {"None": None, "gzip (.gz)": ".gz", "bzip2 (.bz2)": ".bz2", "xz (.xz)": ".xz"}
+NO_PARTITION = "(None)"
+NO_SORT = "(None)"
 
 class ColumnSelectionWindow:
     def __init__(self, parent, columns, selected_columns, column_renames=None):
@@ -365,6 +369,216 @@ class ColumnSelectionWindow:
         self.result_renames = None
         self.window.destroy()
 
+class BatchWindow:
+    """Queue many input files and split them concurrently with the current split settings"""
+
+    def __init__(self, parent, job_settings, schema_cache=None):
+        self.parent = parent
+        self.job_settings = job_settings  # SplitOptions arguments shared by every queued file
+        self.schema_cache = schema_cache
+        self.options_list = []
+        self.runner = None
+        self.thread = None
+        self.closing = False  # Close was clicked mid-batch - destroy the window once the runner returns
+        self.cancel_event = threading.Event()
+
+        # Create window (not modal, so the main form stays usable)
+        self.window = tk.Toplevel(parent)
+        self.window.title("Batch Split")
+        self.window.geometry("640x420")
+        self.window.resizable(True, True)
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.close_clicked)
+
+        self.max_jobs = tk.IntVar(value=min(4, os.cpu_count() or 1))
+        self.summary = tk.StringVar(value="Add files, a glob pattern or a job-spec file to start.")
+
+        self.create_widgets()
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.window, padding="15")
+        main_frame.grid(row=0, column=0, sticky="nsew")
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(0, weight=1)
+
+        # Job list buttons
+        top_frame = ttk.Frame(main_frame)
+        top_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 10))
+        self.add_files_button = ttk.Button(top_frame, text="Add Files...", command=self.add_files)
+        self.add_files_button.pack(side="left", padx=(0, 5))
+        self.add_pattern_button = ttk.Button(top_frame, text="Add Pattern...", command=self.add_pattern)
+        self.add_pattern_button.pack(side="left", padx=(0, 5))
+        self.load_spec_button = ttk.Button(top_frame, text="Load Job Spec...", command=self.load_spec)
+        self.load_spec_button.pack(side="left", padx=(0, 5))
+        self.clear_button = ttk.Button(top_frame, text="Clear", command=self.clear_jobs)
+        self.clear_button.pack(side="left")
+
+        ttk.Label(top_frame, text="Concurrent Jobs:").pack(side="left", padx=(15, 5))
+        ttk.Spinbox(top_frame, from_=1, to=os.cpu_count() or 1, width=4,
+                    textvariable=self.max_jobs, state="readonly").pack(side="left")
+
+        # Per-job status table
+        columns = ("file", "status", "rows", "files", "progress")
+        self.tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=12)
+        for column, heading, width in (("file", "File", 240), ("status", "Status", 150), ("rows", "Rows", 80),
+                                       ("files", "Files", 50), ("progress", "Progress", 70)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor="w" if column in ("file", "status") else "e")
+        tree_scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=tree_scrollbar.set)
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        tree_scrollbar.grid(row=1, column=1, sticky="ns")
+
+        # Aggregate throughput
+        ttk.Label(main_frame, textvariable=self.summary).grid(row=2, column=0, columnspan=2, sticky="w", pady=(10, 0))
+
+        # Bottom buttons
+        bottom_frame = ttk.Frame(main_frame)
+        bottom_frame.grid(row=3, column=0, columnspan=2, pady=(15, 0), sticky="e")
+        self.run_button = ttk.Button(bottom_frame, text="Run", command=self.run_clicked, state="disabled")
+        self.run_button.pack(side="left", padx=(0, 10))
+        self.cancel_button = ttk.Button(bottom_frame, text="Cancel", command=self.cancel_clicked, state="disabled")
+        self.cancel_button.pack(side="left", padx=(0, 10))
+        ttk.Button(bottom_frame, text="Close", command=self.close_clicked).pack(side="left")
+
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(1, weight=1)
+
+    def add_options(self, options_list):
+        for options in options_list:
+            self.tree.insert("", "end", iid=str(len(self.options_list)),
+                             values=(os.path.basename(options.input_file), "Queued", "", "", ""))
+            self.options_list.append(options)
+        if self.options_list:
+            self.run_button.config(state="normal")
+            self.summary.set(f"{len(self.options_list)} job(s) queued.")
+
+    def add_inputs(self, patterns):
+        """Queue the given paths/glob patterns with the shared split settings"""
+        try:
+            options_list = []
+            for path in splitengine.expand_inputs(patterns):
+                # Each input's own delimiter, from the detection cache when the file is unchanged
+                delimiter = splitengine.detect_schema(path, self.schema_cache)['delimiter'] or ','
+                options_list.append(splitengine.SplitOptions(path, input_delimiter=delimiter, **self.job_settings))
+            self.add_options(options_list)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not add files: {e}", parent=self.window)
+
+    def add_files(self):
+        paths = filedialog.askopenfilenames(
+            parent=self.window, title="Select Files to Split",
+            filetypes=[("Supported files", "*.csv *.tsv *.dat *.txt *.json *.jsonl *.ndjson *.gz *.bz2 *.xz"), ("All files", "*.*")]
+        )
+        if paths:
+            self.add_inputs(paths)
+
+    def add_pattern(self):
+        pattern = simpledialog.askstring("Add Pattern", "Glob pattern (e.g. C:/extracts/**/*.csv):",
+                                         parent=self.window)
+        if pattern:
+            self.add_inputs([pattern.strip()])
+
+    def load_spec(self):
+        path = filedialog.askopenfilename(parent=self.window, title="Select Job Spec",
+                                          filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+        if path:
+            try:
+                self.add_options(splitengine.load_job_spec(path))
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not load job spec: {e}", parent=self.window)
+
+    def clear_jobs(self):
+        self.options_list = []
+        self.tree.delete(*self.tree.get_children())
+        self.run_button.config(state="disabled")
+        self.summary.set("")
+
+    def set_running(self, running):
+        state = "disabled" if running else "normal"
+        for button in (self.add_files_button, self.add_pattern_button, self.load_spec_button,
+                       self.clear_button, self.run_button):
+            button.config(state=state)
+        self.cancel_button.config(state="normal" if running else "disabled")
+
+    def run_clicked(self):
+        if not self.options_list:
+            return
+        for iid in self.tree.get_children():
+            self.tree.set(iid, "status", "Queued")
+            self.tree.set(iid, "progress", "")
+        self.cancel_event.clear()
+        self.set_running(True)
+        self.summary.set("Running...")
+        self.runner = splitengine.BatchRunner(self.options_list, self.max_jobs.get(),
+                                              self.on_batch_event, self.cancel_event)
+        self.thread = threading.Thread(target=self.run_batch)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run_batch(self):
+        """Worker thread: run the batch and hand the outcome back to the Tk thread"""
+        try:
+            self.runner.run()
+        except Exception as e:
+            msg = f"An error occurred: {e}"  # e is unbound once the except block ends
+            self.window.after(0, lambda msg=msg: messagebox.showerror("Error", msg, parent=self.window))
+        finally:
+            self.window.after(0, self.batch_finished)
+
+    def batch_finished(self):
+        if not self.window.winfo_exists():
+            return
+        if self.closing:
+            self.window.destroy()
+        else:
+            self.set_running(False)
+
+    def on_batch_event(self, event):
+        """BatchRunner progress callback (worker thread) - schedule the matching UI update"""
+        self.window.after(0, lambda: self.apply_batch_event(event))
+
+    def apply_batch_event(self, event):
+        if not self.window.winfo_exists():
+            return
+        event_type = event['type']
+        iid = str(event.get('job_id'))
+        if event_type == 'job_status':
+            status = event['status'].capitalize()
+            if event.get('error'):
+                status = f"Failed: {event['error']}"
+            self.tree.set(iid, "status", status)
+            if 'rows' in event:
+                self.tree.set(iid, "rows", f"{event['rows']:,}")
+                self.tree.set(iid, "files", str(event['parts']))
+            if event['status'] == "completed":
+                self.tree.set(iid, "progress", "100%")
+        elif event_type == 'progress':
+            self.tree.set(iid, "rows", f"{event['rows']:,}")
+            self.tree.set(iid, "files", str(event['part_num']))
+            self.tree.set(iid, "progress", f"{event['percentage']:.0f}%")
+        elif event_type == 'batch':
+            self.summary.set(
+                f"{event['completed']} of {event['total']} completed, {event['failed']} failed - "
+                f"{event['rows']:,} rows in {event['elapsed']:.1f}s "
+                f"({event['rows_per_sec']:,.0f} rows/s, {event['mb_per_sec']:.1f} MB/s)"
+            )
+
+    def cancel_clicked(self):
+        self.cancel_event.set()
+        self.cancel_button.config(state="disabled")
+        self.summary.set("Cancelling...")
+
+    def close_clicked(self):
+        self.cancel_event.set()
+        if self.thread is not None and self.thread.is_alive():
+            # The runner thread still schedules updates on the window, so it is only
+            # hidden here and destroyed by batch_finished once the batch has stopped
+            self.closing = True
+            self.window.withdraw()
+        else:
+            self.window.destroy()
+
 class FileSplitterApp:
     def __init__(self, root):
         self.root = root
@@ -376,7 +590,7 @@ class FileSplitterApp:
         except Exception as e:
             print(f"Warning: Could not load icon. {e}")
         
-        self.root.geometry("450x700")  # Further reduced height since we removed another checkbox
+        self.root.geometry("450x735")  # Room for the sort row below Partition By
         self.root.resizable(False, False)
         
         # Configure style
@@ -395,6 +609,18 @@ class FileSplitterApp:
         self.open_dir_after_split = tk.BooleanVar(value=False)
         self.create_log = tk.BooleanVar(value=True)
         self.retain_header = tk.BooleanVar(value=True)  # NEW: Default to retaining header
+        self.single_pass = tk.BooleanVar(value=True)  # Skip the row-counting pre-pass when possible
+        self.parallel_split = tk.BooleanVar(value=False)  # Split byte ranges in a process pool
+        self.pipelined = tk.BooleanVar(value=False)  # Read, transform and write on separate threads
+        self.write_checkpoints = tk.BooleanVar(value=False)  # Save resume points while splitting
+        self.write_manifest = tk.BooleanVar(value=False)  # JSON manifest with per-part checksums
+        self.use_index = tk.BooleanVar(value=False)  # Keep a row-offset sidecar index next to the input
+        self.output_compression = tk.StringVar(value="None")  # Per-part output compression
+        self.partition_column = tk.StringVar(value=NO_PARTITION)  # Column whose values get their own parts
+        self.sort_column = tk.StringVar(value=NO_SORT)  # Column the rows are sorted on before splitting
+        self.sort_descending = tk.BooleanVar(value=False)
+        self.compressed_size_target = tk.BooleanVar(value=False)  # Size mode limits the compressed part size
+        self.capture_profile = tk.BooleanVar(value=False)  # Write cProfile/tracemalloc reports with each run
 
         # Column selection variables
         self.available_columns = []
@@ -405,6 +631,7 @@ class FileSplitterApp:
         self.cancel_event = threading.Event()
         self.is_running = False
         self.start_time = 0
+        self.task_event = None  # Latest progress event of a join or row extraction
         
         # Stats variables
         self.current_file = tk.StringVar(value="")
@@ -421,6 +648,8 @@ class FileSplitterApp:
 
         # Load configuration settings
         self.load_config()
+        # Detected dialect and columns per input file version
+        self.schema_cache = splitengine.SchemaCache(os.path.join(self.get_config_dir(), "schema_cache.json"))
 
         self.create_menu()
         self.create_widgets()
@@ -432,6 +661,14 @@ class FileSplitterApp:
         self.open_dir_after_split.trace_add("write", self.on_setting_change)
         self.create_log.trace_add("write", self.on_setting_change)
         self.retain_header.trace_add("write", self.on_setting_change)
+        self.single_pass.trace_add("write", self.on_setting_change)
+        self.parallel_split.trace_add("write", self.on_setting_change)
+        self.pipelined.trace_add("write", self.on_setting_change)
+        self.write_checkpoints.trace_add("write", self.on_setting_change)
+        self.write_manifest.trace_add("write", self.on_setting_change)
+        self.use_index.trace_add("write", self.on_setting_change)
+        self.compressed_size_target.trace_add("write", self.on_setting_change)
+        self.capture_profile.trace_add("write", self.on_setting_change)
         
         # Set up keyboard shortcuts
         self.setup_keyboard_shortcuts()
@@ -471,6 +708,14 @@ class FileSplitterApp:
                 self.open_dir_after_split.set(config.get('open_dir_after_split', False))
                 self.create_log.set(config.get('create_log', True))
                 self.retain_header.set(config.get('retain_header', True))
+                self.single_pass.set(config.get('single_pass', True))
+                self.parallel_split.set(config.get('parallel_split', False))
+                self.pipelined.set(config.get('pipelined', False))
+                self.write_checkpoints.set(config.get('write_checkpoints', False))
+                self.write_manifest.set(config.get('write_manifest', False))
+                self.use_index.set(config.get('use_index', False))
+                self.compressed_size_target.set(config.get('compressed_size_target', False))
+                self.capture_profile.set(config.get('capture_profile', False))
                 
                 print(f"Configuration loaded from: {config_file}")
             else:
@@ -493,7 +738,15 @@ class FileSplitterApp:
             config = {
                 'open_dir_after_split': self.open_dir_after_split.get(),
                 'create_log': self.create_log.get(),
-                'retain_header': self.retain_header.get()
+                'retain_header': self.retain_header.get(),
+                'single_pass': self.single_pass.get(),
+                'parallel_split': self.parallel_split.get(),
+                'pipelined': self.pipelined.get(),
+                'write_checkpoints': self.write_checkpoints.get(),
+                'write_manifest': self.write_manifest.get(),
+                'use_index': self.use_index.get(),
+                'compressed_size_target': self.compressed_size_target.get(),
+                'capture_profile': self.capture_profile.get()
             }
             
             # Save to file
@@ -549,6 +802,11 @@ class FileSplitterApp:
 
         # File menu
         file_menu = Menu(menubar, tearoff=0)
+        file_menu.add_command(label="Resume Split", command=lambda: self.start_threaded_split(resume=True))
+        file_menu.add_command(label="Split New Records", command=lambda: self.start_threaded_split(incremental=True))
+        file_menu.add_command(label="Batch Split...", command=self.open_batch_window)
+        file_menu.add_command(label="Extract Rows...", command=self.extract_row_range)
+        file_menu.add_command(label="Join Parts...", command=self.join_split_parts)
         file_menu.add_command(label="Clear Inputs", command=self.reset_stats_and_progress, accelerator="Ctrl+R")
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit, accelerator="Ctrl+Q")
@@ -562,6 +820,22 @@ class FileSplitterApp:
                                     variable=self.create_log)
         settings_menu.add_checkbutton(label="Retain Headers", 
                                     variable=self.retain_header)
+        settings_menu.add_checkbutton(label="Single-Pass Processing", 
+                                    variable=self.single_pass)
+        settings_menu.add_checkbutton(label="Parallel Processing", 
+                                    variable=self.parallel_split)
+        settings_menu.add_checkbutton(label="Pipelined Processing (Slow Storage)", 
+                                    variable=self.pipelined)
+        settings_menu.add_checkbutton(label="Write Checkpoints", 
+                                    variable=self.write_checkpoints)
+        settings_menu.add_checkbutton(label="Write Manifest", 
+                                    variable=self.write_manifest)
+        settings_menu.add_checkbutton(label="Row Index Sidecar", 
+                                    variable=self.use_index)
+        settings_menu.add_checkbutton(label="Size Targets Compressed Parts", 
+                                    variable=self.compressed_size_target)
+        settings_menu.add_checkbutton(label="Capture Profile", 
+                                    variable=self.capture_profile)
         menubar.add_cascade(label="Settings", menu=settings_menu)
 
         # Help menu
@@ -621,10 +895,28 @@ class FileSplitterApp:
         self.column_select_button = ttk.Button(button_frame, text="Modify Columns...", 
                                              command=self.open_column_selection, state="disabled")
         self.column_select_button.pack(side="left")
-        
-        # Split mode selection - moved to row 1
+
+        ttk.Label(button_frame, text="Partition By:").pack(side="left", padx=(20, 0))
+        self.partition_combo = ttk.Combobox(button_frame, textvariable=self.partition_column,
+                                            values=[NO_PARTITION], width=20, state="disabled")
+        self.partition_combo.pack(side="left", padx=(10, 0))
+
+        # Sort settings - row 1
+        sort_frame = ttk.Frame(settings_frame)
+        sort_frame.grid(row=1, column=0, columnspan=2, pady=(0, 10), sticky="w")
+
+        ttk.Label(sort_frame, text="Sort By:").pack(side="left")
+        self.sort_combo = ttk.Combobox(sort_frame, textvariable=self.sort_column,
+                                       values=[NO_SORT], width=20, state="disabled")
+        self.sort_combo.pack(side="left", padx=(10, 0))
+        self.sort_descending_checkbox = ttk.Checkbutton(sort_frame, text="Descending",
+                                                        variable=self.sort_descending)
+        self.sort_descending_checkbox.state(["disabled"])
+        self.sort_descending_checkbox.pack(side="left", padx=(10, 0))
+        
+        # Split mode selection - moved to row 2
         split_mode_frame = ttk.Frame(settings_frame)
-        split_mode_frame.grid(row=1, column=0, columnspan=4, sticky="w", pady=(0, 0))
+        split_mode_frame.grid(row=2, column=0, columnspan=4, sticky="w", pady=(0, 0))
         
         ttk.Label(split_mode_frame, text="Split Mode:").pack(side="left")
         
@@ -635,16 +927,20 @@ class FileSplitterApp:
         self.split_value_entry = tk.Entry(split_mode_frame, textvariable=self.split_value, width=10, state="disabled")
         self.split_value_entry.pack(side="left")
         
-        # File type selection - moved to row 2
+        # File type selection - moved to row 3
         file_type_frame = ttk.Frame(settings_frame)
-        file_type_frame.grid(row=2, column=0, columnspan=2, pady=(10, 0), sticky="w")
+        file_type_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0), sticky="w")
         
         ttk.Label(file_type_frame, text="Output file type:").pack(side="left")
-        ttk.Combobox(file_type_frame, textvariable=self.file_type, values=[".csv", ".txt", ".dat", ".json"], width=10).pack(side="left", padx=(10, 0))
+        ttk.Combobox(file_type_frame, textvariable=self.file_type, values=[".csv", ".txt", ".dat", ".json", ".jsonl", ".ndjson"], width=10).pack(side="left", padx=(10, 0))
+
+        ttk.Label(file_type_frame, text="Compression:").pack(side="left", padx=(20, 0))
+        ttk.Combobox(file_type_frame, textvariable=self.output_compression, values=list(COMPRESSION_CHOICES),
+                     state="readonly", width=12).pack(side="left", padx=(10, 0))
 
-        # Delimiter settings - moved to row 3
+        # Delimiter settings - moved to row 4
         delimiter_frame = ttk.Frame(settings_frame)
-        delimiter_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0), sticky="w")
+        delimiter_frame.grid(row=4, column=0, columnspan=2, pady=(10, 0), sticky="w")
         
         self.delim_checkbox = ttk.Checkbutton(delimiter_frame, text="Custom Delimiter", 
                                             variable=self.use_custom_delim, command=self.toggle_delim_fields)
@@ -656,9 +952,9 @@ class FileSplitterApp:
         self.delimiter_combo['values'] = ('comma (,)', 'tab (\\t)', 'semicolon (;)', 'pipe (|)', 'asterisk (*)')
         self.delimiter_combo.pack(side="left", padx=(10, 0))
         
-        # Quote mode settings - row 4
+        # Quote mode settings - row 5
         quote_frame = ttk.Frame(settings_frame)
-        quote_frame.grid(row=4, column=0, columnspan=2, pady=(10, 0), sticky="w")
+        quote_frame.grid(row=5, column=0, columnspan=2, pady=(10, 0), sticky="w")
         
         ttk.Label(quote_frame, text="Quoted Identifier Handling:").pack(side="left")
         
@@ -756,19 +1052,18 @@ class FileSplitterApp:
         if not file_path:
             return False
         
-        # Get file extension in lowercase
-        _, ext = os.path.splitext(file_path.lower())
-        
-        # Supported input file types
-        supported_extensions = {'.csv', '.tsv', '.txt', '.dat', '.json'}
+        # Get file extension in lowercase, looking through a .gz/.bz2/.xz suffix
+        ext = splitengine.file_ext(file_path)
         
-        return ext in supported_extensions
+        return ext in splitengine.SUPPORTED_INPUT_EXTENSIONS
 
     def select_file(self):
         path = filedialog.askopenfilename(
             title="Select File to Split",
             filetypes=[("CSV files", "*.csv"), ("TSV files", "*.tsv"), ("DAT files", "*.dat"), 
-                      ("TXT files", "*.txt"), ("JSON files", "*.json"), ("All files", "*.*")]
+                      ("TXT files", "*.txt"), ("JSON files", "*.json"),
+                      ("JSON Lines files", "*.jsonl *.ndjson"),
+                      ("Compressed files", "*.gz *.bz2 *.xz"), ("All files", "*.*")]
         )
         if path:
             # Check if the selected file type is supported
@@ -782,7 +1077,9 @@ class FileSplitterApp:
                     f"• TSV files (.tsv)\n"
                     f"• Text files (.txt)\n"
                     f"• Data files (.dat)\n"
-                    f"• JSON files (.json)\n\n"
+                    f"• JSON files (.json)\n"
+                    f"• JSON Lines files (.jsonl, .ndjson)\n"
+                    f"• Any of these compressed with gzip, bzip2 or xz (.gz, .bz2, .xz)\n\n"
                     f"Please select a file with a supported format."
                 )
                 return
@@ -792,139 +1089,37 @@ class FileSplitterApp:
             self.input_file.set(path)
             self.delim_checkbox.state(["!disabled"])
             
-            # Load column headers
+            # Load column headers and the detected delimiter
             self.load_column_headers()
-            
-            # Only try to detect delimiter for non-JSON files
-            _, ext = os.path.splitext(path.lower())
-            if ext != '.json':
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        sample = f.read(2048)
-                        sniffer = csv.Sniffer()
-                        dialect = sniffer.sniff(sample)
-                        self.detected_delimiter.set(dialect.delimiter)
-                except Exception as e:
-                    self.detected_delimiter.set(',')
-                    print(f"Could not detect delimiter: {e}")
-            else:
-                self.detected_delimiter.set(',')  # Default delimiter for JSON conversion
                 
             if self.use_custom_delim.get():
                 self.toggle_delim_fields()
 
     def load_column_headers(self):
-        """Load column headers from the selected file"""
+        """Load column headers and the delimiter of the selected file.
+
+        Detection samples several points of the file and is cached per file version,
+        so reopening a large file is instant.
+        """
         if not self.input_file.get():
             return
             
         try:
-            _, ext = os.path.splitext(self.input_file.get().lower())
-            
-            if ext == '.json':
-                # Handle JSON files
-                with open(self.input_file.get(), 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                # Handle different JSON structures
-                if isinstance(data, list) and data:
-                    # Array of objects - most common case
-                    ordered_keys = []
-                    seen_keys = set()
-                    
-                    # Get keys from first object to establish order
-                    if isinstance(data[0], dict):
-                        first_obj_keys = self.flatten_json_keys(data[0])
-                        for key in first_obj_keys:
-                            if key not in seen_keys:
-                                ordered_keys.append(key)
-                                seen_keys.add(key)
-                    
-                    # Collect any additional keys from remaining objects (append to end)
-                    for item in data[1:101]:  # Sample up to 100 more items for performance
-                        if isinstance(item, dict):
-                            item_keys = self.flatten_json_keys(item)
-                            for key in item_keys:
-                                if key not in seen_keys:
-                                    ordered_keys.append(key)
-                                    seen_keys.add(key)
-                    
-                    self.available_columns = ordered_keys
-                    self.selected_columns = self.available_columns.copy()
-                    
-                elif isinstance(data, dict):
-                    # Single object - treat keys as columns
-                    all_keys = self.flatten_json_keys(data)
-                    self.available_columns = all_keys  # No need to sort, already in order
-                    self.selected_columns = self.available_columns.copy()
-                else:
-                    # Unsupported JSON structure
-                    self.available_columns = []
-                    self.selected_columns = []
-                    
-            else:
-                # Handle CSV/TXT/DAT files
-                with open(self.input_file.get(), 'r', encoding='utf-8') as f:
-                    sample = f.read(2048)
-                    f.seek(0)
-                    
-                    # Detect delimiter
-                    sniffer = csv.Sniffer()
-                    try:
-                        dialect = sniffer.sniff(sample)
-                        delimiter = dialect.delimiter
-                    except:
-                        delimiter = ','
-                    
-                    # Read header row
-                    reader = csv.reader(f, delimiter=delimiter)
-                    header = next(reader)
-                    
-                    self.available_columns = header
-                    self.selected_columns = header.copy()  # By default, include all columns
+            schema = splitengine.detect_schema(self.input_file.get(), self.schema_cache)
+            self.available_columns = list(schema['columns'])
+            self.selected_columns = self.available_columns.copy()  # By default, include all columns
+            self.partition_combo['values'] = [NO_PARTITION] + self.available_columns
+            self.partition_column.set(NO_PARTITION)
+            self.sort_combo['values'] = [NO_SORT] + self.available_columns
+            self.sort_column.set(NO_SORT)
+            # JSON input has no delimiter - comma is the default for conversion
+            self.detected_delimiter.set(schema['delimiter'] or ',')
                 
         except Exception as e:
             print(f"Error loading column headers: {e}")
             self.available_columns = []
             self.selected_columns = []
-
-    def flatten_json_keys(self, obj, parent_key='', sep='.'):
-        """Flatten nested JSON object keys with dot notation, preserving order"""
-        keys = []  # Use list to preserve order
-        
-        if isinstance(obj, dict):
-            for key, value in obj.items():  # dict.items() preserves insertion order in Python 3.7+
-                new_key = f"{parent_key}{sep}{key}" if parent_key else key
-                keys.append(new_key)
-                
-                # Recursively flatten nested objects
-                if isinstance(value, dict):
-                    keys.extend(self.flatten_json_keys(value, new_key, sep))
-                elif isinstance(value, list) and value and isinstance(value[0], dict):
-                    # Handle arrays of objects by flattening the first object
-                    keys.extend(self.flatten_json_keys(value[0], new_key, sep))
-        
-        return keys
-
-    def flatten_json_object(self, obj, parent_key='', sep='.'):
-        """Flatten a nested JSON object into a flat dictionary"""
-        flattened = {}
-        
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                new_key = f"{parent_key}{sep}{key}" if parent_key else key
-                
-                if isinstance(value, dict):
-                    flattened.update(self.flatten_json_object(value, new_key, sep))
-                elif isinstance(value, list):
-                    # Convert lists to string representation
-                    flattened[new_key] = json.dumps(value) if value else ''
-                else:
-                    flattened[new_key] = str(value) if value is not None else ''
-        else:
-            flattened[parent_key] = str(obj) if obj is not None else ''
-        
-        return flattened
+            self.detected_delimiter.set(',')
 
     def open_column_selection(self):
         """Open the column selection window"""
@@ -939,9 +1134,108 @@ class FileSplitterApp:
             self.selected_columns = dialog.result
             self.column_renames = dialog.result_renames
 
-    def get_output_column_names(self, original_columns):
-        """Get the output column names (renamed if applicable) for the given original columns"""
-        return [self.column_renames.get(col, col) for col in original_columns]
+    def open_batch_window(self):
+        """Open the batch window, which applies the current split settings to every queued file"""
+        try:
+            value = int(self.split_value.get())
+            if value <= 0:
+                raise ValueError
+        except ValueError:
+            self.highlight_field_error(self.split_value_entry)
+            messagebox.showwarning("Warning", "Please enter a valid positive number for the split value before starting a batch.")
+            return
+
+        # Column selection and the detected delimiter belong to the selected file, so
+        # batch jobs keep all columns and sniff each input's own delimiter
+        job_settings = {
+            'mode': self.get_split_mode_value(),
+            'value': value,
+            'file_extension': self.file_type.get().strip().lower(),
+            'delimiter': self.get_delimiter_symbol(self.custom_delimiter.get()) if self.use_custom_delim.get() else None,
+            'quote_mode': self.get_quote_mode(),
+            'include_header': self.retain_header.get(),
+            'single_pass': self.single_pass.get(),
+            'pipeline': self.pipelined.get(),
+            'checkpoint': self.write_checkpoints.get(),
+            'manifest': self.write_manifest.get(),
+            'create_log': self.create_log.get(),
+            'use_index': self.use_index.get(),
+            'compression': COMPRESSION_CHOICES.get(self.output_compression.get()),
+            'size_target': "compressed" if self.compressed_size_target.get() else "uncompressed",
+            'profile': self.capture_profile.get(),
+        }
+        BatchWindow(self.root, job_settings, self.schema_cache)
+
+    def extract_row_range(self):
+        """Copy a range of data rows (plus the header) of the selected file into the output directory"""
+        if self.is_running:
+            messagebox.showwarning("Warning", "Please wait for the current operation to finish.")
+            return
+        file_path = self.input_file.get()
+        if not file_path or splitengine.file_ext(file_path) == '.json':
+            messagebox.showwarning("Warning", "Please select a CSV, TSV, TXT, DAT or JSON Lines file to extract rows from.")
+            return
+
+        first_row = simpledialog.askinteger("Extract Rows", "First data row:", parent=self.root, minvalue=1)
+        if first_row is None:
+            return
+        last_row = simpledialog.askinteger("Extract Rows", "Last data row:", parent=self.root, minvalue=first_row)
+        if last_row is None:
+            return
+
+        out_dir = self.output_dir.get() or os.path.join(os.path.dirname(file_path), "split_files")
+        base_filename, ext = os.path.splitext(os.path.basename(file_path))
+        output_file = os.path.join(out_dir, f"{base_filename}_rows_{first_row}-{last_row}{ext}")
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+        except OSError as e:
+            messagebox.showerror("Error", f"An error occurred: {e}")
+            return
+        # Tk variables must not be read from the worker thread
+        include_header = self.retain_header.get()
+        delimiter = self.detected_delimiter.get() or None
+        self.start_threaded_task(
+            "Extract Rows",
+            lambda progress, cancel: splitengine.extract_rows(file_path, first_row, last_row, output_file,
+                                                              include_header=include_header, delimiter=delimiter,
+                                                              progress_callback=progress, cancel_event=cancel),
+            lambda event: (f"Indexing... {event['rows']:,} rows" if event['type'] == 'analyzing'
+                           else f"Copying rows {first_row:,}-{last_row:,}..."),
+            lambda rows: f"Extracted {rows:,} rows to:\n{output_file}")
+
+    def join_split_parts(self):
+        """Reassemble the parts of an earlier split into one file"""
+        if self.is_running:
+            messagebox.showwarning("Warning", "Please wait for the current operation to finish.")
+            return
+        part_file = filedialog.askopenfilename(
+            title="Select Any Part to Join",
+            initialdir=self.output_dir.get() or None,
+            filetypes=[("Split parts", "*.csv *.tsv *.dat *.txt *.json *.jsonl *.ndjson *.gz *.bz2 *.xz"), ("All files", "*.*")]
+        )
+        if not part_file:
+            return
+        try:
+            parts = splitengine.find_parts(part_file)
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+
+        base_filename = splitengine.PART_NAME.match(os.path.basename(parts[0])).group(1)
+        ext = splitengine.file_ext(parts[0])
+        output_file = filedialog.asksaveasfilename(
+            title="Save Joined File As",
+            initialdir=os.path.dirname(parts[0]),
+            initialfile=f"{base_filename}_joined{ext}",
+            defaultextension=ext
+        )
+        if not output_file:
+            return
+        self.start_threaded_task(
+            "Join Parts",
+            lambda progress, cancel: splitengine.join_parts(parts, output_file, progress_callback=progress, cancel_event=cancel),
+            lambda event: f"Joining part {event['part']} of {event['parts']}...",
+            lambda size: f"Joined {len(parts)} parts ({size / (1024 * 1024):.2f} MB) into:\n{output_file}")
 
     def select_output_directory(self):
         path = filedialog.askdirectory(title="Select Output Directory")
@@ -959,7 +1253,7 @@ class FileSplitterApp:
 
     def on_file_type_change(self, *args):
         """Handle file type changes to enable/disable delimiter and header options"""
-        if self.file_type.get() == ".json":
+        if self.file_type.get() in splitengine.JSON_EXTENSIONS:
             # Output is JSON - disable delimiter options (JSON doesn't use delimiters)
             self.use_custom_delim.set(False)
             self.delim_checkbox.state(["disabled"])
@@ -1026,12 +1320,11 @@ class FileSplitterApp:
         # Enable/disable the delimiter combobox - only relevant for delimited output formats
         if (self.use_custom_delim.get() and 
             self.input_file.get() and 
-            self.file_type.get() != ".json"):  # Only check output format
+            self.file_type.get() not in splitengine.JSON_EXTENSIONS):  # Only check output format
             self.delimiter_combo.config(state="readonly")
             
             # Only filter out detected delimiter for delimited input files (not JSON)
-            _, input_ext = os.path.splitext(self.input_file.get().lower())
-            is_json_input = input_ext == '.json'
+            is_json_input = splitengine.file_ext(self.input_file.get()) in splitengine.JSON_EXTENSIONS
             
             # All available options
             all_options = ['comma (,)', 'tab (\\t)', 'semicolon (;)', 'pipe (|)', 'asterisk (*)']
@@ -1072,12 +1365,14 @@ class FileSplitterApp:
     
     def update_quote_mode_state(self):
         """Enable/disable quote mode dropdown based on file selection and output format"""
-        if (self.input_file.get() and self.file_type.get() != ".json"):
+        if (self.input_file.get() and self.file_type.get() not in splitengine.JSON_EXTENSIONS):
             self.quote_combo.config(state="readonly")
         else:
             self.quote_combo.config(state="disabled")
 
-    def start_threaded_split(self):
+    def start_threaded_split(self, resume=False, incremental=False):
+        """Start a split of the form's file; with resume, continue from its checkpoint in the output directory,
+        and with incremental, split only the records appended since the last incremental run"""
         file_path = self.input_file.get()
         extension = self.file_type.get().strip().lower()
         out_dir = self.output_dir.get()
@@ -1100,7 +1395,9 @@ class FileSplitterApp:
                 f"• TSV files (.tsv)\n"
                 f"• Text files (.txt)\n"
                 f"• Data files (.dat)\n"
-                f"• JSON files (.json)\n\n"
+                f"• JSON files (.json)\n"
+                f"• JSON Lines files (.jsonl, .ndjson)\n"
+                f"• Any of these compressed with gzip, bzip2 or xz (.gz, .bz2, .xz)\n\n"
                 f"Please select a file with a supported format."
             )
             return
@@ -1114,9 +1411,39 @@ class FileSplitterApp:
             messagebox.showwarning("Warning", "Please enter a valid positive number for the split value.")
             return
 
+        partition_by = self.partition_column.get()
+        partition_by = None if partition_by == NO_PARTITION else partition_by
+        sort_by = self.sort_column.get()
+        sort_by = None if sort_by == NO_SORT else sort_by
+        if partition_by and mode == "files":
+            messagebox.showwarning("Warning", "Partitioning applies a size or row limit to each column value.\n\n"
+                                              "Please choose Size (MB) or Rows Per File.")
+            return
+
         if not out_dir:
             out_dir = os.path.join(os.path.dirname(file_path), "split_files")
 
+        delim = self.get_delimiter_symbol(self.custom_delimiter.get()) if self.use_custom_delim.get() else self.detected_delimiter.get() or ','
+        # Snapshot the form into engine options here - Tk variables must not be read from the worker thread
+        try:
+            options = splitengine.SplitOptions(
+                file_path, mode=mode, value=value, output_dir=out_dir, file_extension=extension,
+                delimiter=delim, input_delimiter=self.detected_delimiter.get() or ',',
+                quote_mode=self.get_quote_mode(), selected_columns=self.selected_columns,
+                column_renames=self.column_renames, include_header=self.retain_header.get(),
+                single_pass=self.single_pass.get(), parallel=self.parallel_split.get(), pipeline=self.pipelined.get(),
+                create_log=self.create_log.get(), use_index=self.use_index.get(),
+                compression=COMPRESSION_CHOICES.get(self.output_compression.get()),
+                size_target="compressed" if self.compressed_size_target.get() else "uncompressed",
+                profile=self.capture_profile.get(), partition_by=partition_by,
+                sort_by=sort_by, sort_descending=self.sort_descending.get(),
+                checkpoint=(self.write_checkpoints.get() or resume) and not incremental, resume=resume,
+                incremental=incremental, manifest=self.write_manifest.get())
+        except ValueError as e:
+            # e.g. an incremental split of input that cannot be appended to
+            messagebox.showwarning("Warning", str(e))
+            return
+
         # Reset progress tracking
         self.cancel_event.clear()
         self.is_running = True
@@ -1142,557 +1469,121 @@ class FileSplitterApp:
         # Show percentage label
         self.progress_label.grid()
 
-        delim = self.get_delimiter_symbol(self.custom_delimiter.get()) if self.use_custom_delim.get() else self.detected_delimiter.get() or ','
-        quote_mode = self.get_quote_mode()  # Get the selected quote mode
-        thread = threading.Thread(target=self.split_file, 
-                                args=(file_path, out_dir, mode, value, extension, delim, quote_mode))
+        engine = splitengine.SplitEngine(options, self.on_split_event, self.cancel_event)
+        thread = threading.Thread(target=self.run_split, args=(engine,))
         thread.daemon = True
         thread.start()
+        self.poll_progress(engine, -1)
 
-    def cancel_operation(self):
-        if self.is_running:
-            self.cancel_event.set()
-            self.current_file.set("Cancelling...")
-            self.button_cancel.config(state=tk.DISABLED)
-
-    def update_progress(self, current_row, total_rows, current_filename, part_num=1):
-        """Update progress from worker thread"""
-        if total_rows > 0:
-            percentage = min(100, (current_row / total_rows) * 100)
-            
-            # Schedule UI updates
-            self.root.after(0, lambda: self.progress.configure(value=percentage))
-            self.root.after(0, lambda: self.progress_percentage.set(f"{percentage:.1f}%"))
-            self.root.after(0, lambda: self.current_file.set(os.path.basename(current_filename)))
-            self.root.after(0, lambda: self.rows_processed.set(f"{current_row:,}"))
-            self.root.after(0, lambda: self.file_count.set(str(part_num)))
-
-    def split_file(self, input_file, output_dir, mode, size_or_rows, file_extension, custom_delimiter, quote_mode):
-        cancelled = False
-        analysis_rows_counted = 0
-        part_num = 1
-        base_filename = os.path.splitext(os.path.basename(input_file))[0]
-        input_data_row_count = 0
-        output_data_row_count = 0
-        per_file_row_counts = []
-        
+    def run_split(self, engine):
+        """Worker thread: run the engine and hand the outcome back to the Tk thread"""
         try:
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Detect input file type
-            _, input_ext = os.path.splitext(input_file.lower())
-            is_json_input = input_ext == '.json'
-            
-            # First pass: count total rows for progress tracking
-            self.root.after(0, lambda: self.total_rows.set("Analyzing file..."))
-            total_rows = 0
-            
-            if is_json_input:
-                # Handle JSON input
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                if isinstance(data, list):
-                    total_rows = len(data)
-                    # Get all possible column keys in order (same logic as load_column_headers)
-                    ordered_keys = []
-                    seen_keys = set()
-                    
-                    # Get keys from first object to establish order
-                    if data and isinstance(data[0], dict):
-                        first_obj_keys = self.flatten_json_keys(data[0])
-                        for key in first_obj_keys:
-                            if key not in seen_keys:
-                                ordered_keys.append(key)
-                                seen_keys.add(key)
-                    
-                    # Collect any additional keys from remaining objects
-                    for item in data[1:101]:  # Sample up to 100 more items
-                        if isinstance(item, dict):
-                            item_keys = self.flatten_json_keys(item)
-                            for key in item_keys:
-                                if key not in seen_keys:
-                                    ordered_keys.append(key)
-                                    seen_keys.add(key)
-                    
-                    header = ordered_keys
-                elif isinstance(data, dict):
-                    total_rows = 1
-                    header = self.flatten_json_keys(data)  # Already in order
-                else:
-                    raise ValueError("Unsupported JSON structure. Expected array of objects or single object.")
-                    
-                # Filter header to only include selected columns, preserving order
-                if self.selected_columns:
-                    filtered_header = [col for col in header if col in self.selected_columns]
-                    # Apply column renames to the filtered header for output
-                    output_header = self.get_output_column_names(filtered_header)
-                else:
-                    filtered_header = header
-                    output_header = self.get_output_column_names(filtered_header)
-                    
-            else:
-                # Handle CSV/TXT/DAT input
-                with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-                    detected_delimiter = self.detected_delimiter.get() or ','
-                    reader = csv.reader(infile, delimiter=detected_delimiter)
-                    header = next(reader)  # Read and store header
-                    
-                    # Filter header to only include selected columns
-                    if self.selected_columns:
-                        header_indices = [i for i, col in enumerate(header) if col in self.selected_columns]
-                        filtered_header = [header[i] for i in header_indices]
-                        # Apply column renames to the filtered header for output
-                        output_header = self.get_output_column_names(filtered_header)
-                    else:
-                        header_indices = list(range(len(header)))
-                        filtered_header = header
-                        output_header = self.get_output_column_names(filtered_header)
-                    
-                    # Count only data rows (excluding header)
-                    for _ in reader:
-                        if self.cancel_event.is_set():
-                            cancelled = True
-                            analysis_rows_counted = total_rows
-                            break
-                        total_rows += 1
-                        if total_rows % 1000 == 0:
-                            self.root.after(0, lambda r=total_rows: self.total_rows.set(f"Analyzing... {r:,} rows"))
-
-            if self.cancel_event.is_set() and not cancelled:
-                cancelled = True
-                analysis_rows_counted = total_rows
-
-            # Update total rows display
-            self.root.after(0, lambda: self.total_rows.set(f"{total_rows:,}"))
-
-            # If cancelled during analysis, still write log
-            if cancelled:
-                self.write_cancellation_log(input_file, output_dir, file_extension, custom_delimiter, 
-                                           analysis_rows_counted, 0, [], "during analysis", part_num)
+            result = engine.run()
+            self.input_row_count = result.input_rows
+            self.output_row_count = result.output_rows
+            self.root.after(0, lambda: self.apply_progress(engine.progress.state))
+            if result.cancelled:
                 self.root.after(0, lambda: self.show_cancelled())
-                return
-
-            # NEW: Handle "Number of Files" mode
-            if mode == "files":
-                # Calculate rows per file for even distribution
-                num_files = size_or_rows
-                if num_files > total_rows:
-                    # If requesting more files than rows, limit to one row per file
-                    num_files = total_rows
-                    messagebox.showinfo("Info", f"Requested {size_or_rows} files, but only {total_rows} rows available. Creating {num_files} files instead.")
-                
-                # Calculate rows per file (using ceiling to ensure all rows are included)
-                max_rows = math.ceil(total_rows / num_files)
-                # Switch to rows mode for the actual splitting
-                mode = "rows"
-                size_or_rows = max_rows
-
-            # Second pass: actual splitting with progress tracking and column filtering
-            max_size_bytes = size_or_rows * 1024 * 1024 if mode == "size" else None
-            max_rows = size_or_rows if mode == "rows" else None
-            is_json_format = file_extension == ".json"
-            include_header = self.retain_header.get()  # NEW: Get header retention setting
-
-            if is_json_input:
-                # Process JSON input data
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                if isinstance(data, list):
-                    json_rows = data
-                elif isinstance(data, dict):
-                    json_rows = [data]
-                else:
-                    json_rows = []
-                    
-                processed_rows = 0
-                output_path = os.path.join(output_dir, f"{base_filename}_{part_num}{file_extension}")
-                
-                if is_json_format:
-                    # JSON to JSON splitting
-                    current_json_data = []
-                    current_rows = 0
-                    estimated_size = 2  # Start with "[]"
-                    avg_row_size = 0
-                else:
-                    # JSON to CSV/TXT/DAT conversion
-                    outfile = open(output_path, 'w', newline='', encoding='utf-8')
-                    writer = csv.writer(outfile, delimiter=custom_delimiter, quoting=quote_mode)
-                    if include_header:
-                        writer.writerow(output_header)
-                    current_size = outfile.tell()
-                    current_rows = 0
-
-                # Process JSON data rows
-                for json_row in json_rows:
-                    if self.cancel_event.is_set():
-                        cancelled = True
-                        if not is_json_format:
-                            outfile.close()
-                        # Write partial file counts for logging
-                        if current_rows > 0:
-                            if is_json_format and current_json_data:
-                                with open(output_path, 'w', encoding='utf-8') as json_file:
-                                    json.dump(current_json_data, json_file, separators=(',', ':'))
-                            per_file_row_counts.append(current_rows)
-                            output_data_row_count += current_rows
-                        break
-
-                    input_data_row_count += 1
-                    processed_rows += 1
-                    
-                    # Convert JSON object to flat row
-                    if isinstance(json_row, dict):
-                        flattened_row = self.flatten_json_object(json_row)
-                        # Create filtered row based on selected columns
-                        filtered_row = [flattened_row.get(col, '') for col in filtered_header]
-                    else:
-                        # Handle non-dict items
-                        filtered_row = [str(json_row)]
-                    
-                    # Update progress every 100 rows
-                    if processed_rows % 100 == 0:
-                        self.update_progress(processed_rows, total_rows, output_path, part_num)
-                    
-                    if is_json_format:
-                        # JSON to JSON - recreate object with selected columns only using renamed headers
-                        if isinstance(json_row, dict):
-                            filtered_obj = {}
-                            for i, col in enumerate(filtered_header):
-                                output_name = output_header[i]
-                                filtered_obj[output_name] = flattened_row.get(col, '')
-                        else:
-                            filtered_obj = json_row
-                            
-                        current_json_data.append(filtered_obj)
-                        current_rows += 1
-                        
-                        # Size estimation for JSON
-                        if mode == "size":
-                            if current_rows <= 10:
-                                row_json_size = len(json.dumps(filtered_obj, separators=(',', ':')))
-                                estimated_size += row_json_size + (1 if current_rows > 1 else 0)
-                                avg_row_size = estimated_size / current_rows if current_rows > 0 else 0
-                            else:
-                                estimated_size += avg_row_size + 1
-                        
-                        # Check if we need to split
-                        split_needed = False
-                        if mode == "size":
-                            split_needed = estimated_size >= max_size_bytes
-                        else:
-                            split_needed = current_rows >= max_rows
-                            
-                        if split_needed:
-                            with open(output_path, 'w', encoding='utf-8') as json_file:
-                                json.dump(current_json_data, json_file, separators=(',', ':'))
-                            
-                            per_file_row_counts.append(current_rows)
-                            output_data_row_count += current_rows
-                            part_num += 1
-                            output_path = os.path.join(output_dir, f"{base_filename}_{part_num}{file_extension}")
-                            current_json_data = []
-                            current_rows = 0
-                            estimated_size = 2
-                    else:
-                        # JSON to CSV/TXT/DAT conversion
-                        # Check if we need to split before writing this row
-                        outfile.flush()
-                        if (
-                            (mode == "size" and current_size >= max_size_bytes) or
-                            (mode == "rows" and current_rows >= max_rows)
-                        ):
-                            outfile.close()
-                            per_file_row_counts.append(current_rows)
-                            output_data_row_count += current_rows
-                            part_num += 1
-                            output_path = os.path.join(output_dir, f"{base_filename}_{part_num}{file_extension}")
-                            outfile = open(output_path, 'w', newline='', encoding='utf-8')
-                            writer = csv.writer(outfile, delimiter=custom_delimiter, quoting=quote_mode)
-                            if include_header:
-                                writer.writerow(output_header)
-                            current_size = outfile.tell()
-                            current_rows = 0
-
-                        # Write the converted row
-                        writer.writerow(filtered_row)
-                        current_size = outfile.tell()
-                        current_rows += 1
-
-                # Handle the last file for JSON input
-                if cancelled:
-                    self.write_cancellation_log(input_file, output_dir, file_extension, custom_delimiter, 
-                                               input_data_row_count, output_data_row_count, per_file_row_counts, 
-                                               "during file splitting", part_num)
-                    self.root.after(0, lambda: self.show_cancelled())
-                    return
-
-                if is_json_format:
-                    if current_json_data:
-                        with open(output_path, 'w', encoding='utf-8') as json_file:
-                            json.dump(current_json_data, json_file, separators=(',', ':'))
-                        per_file_row_counts.append(current_rows)
-                        output_data_row_count += current_rows
-                else:
-                    outfile.close()
-                    per_file_row_counts.append(current_rows)
-                    output_data_row_count += current_rows
-                    
             else:
-                # Handle CSV/TXT/DAT input (existing logic)
-                with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-                    detected_delimiter = self.detected_delimiter.get() or ','
-                    reader = csv.reader(infile, delimiter=detected_delimiter)
-                    header = next(reader)  # Read and consume header row
-                    
-                    # Filter header to only include selected columns
-                    if self.selected_columns:
-                        header_indices = [i for i, col in enumerate(header) if col in self.selected_columns]
-                        filtered_header = [header[i] for i in header_indices]
-                        # Apply column renames to the filtered header for output
-                        output_header = self.get_output_column_names(filtered_header)
-                    else:
-                        header_indices = list(range(len(header)))
-                        filtered_header = header
-                        output_header = self.get_output_column_names(filtered_header)
-
-                    processed_rows = 0
-                    output_path = os.path.join(output_dir, f"{base_filename}_{part_num}{file_extension}")
-                    
-                    if is_json_format:
-                        # CSV to JSON conversion
-                        current_json_data = []
-                        current_rows = 0
-                        estimated_size = 2  # Start with "[]" 
-                        avg_row_size = 0  # Track average row size for better estimation
-                    else:
-                        # CSV to CSV/TXT/DAT
-                        outfile = open(output_path, 'w', newline='', encoding='utf-8')
-                        writer = csv.writer(outfile, delimiter=custom_delimiter, quoting=quote_mode)
-                        if include_header:  # NEW: Conditionally write header
-                            writer.writerow(output_header)  # Write renamed header
-                        current_size = outfile.tell()
-                        current_rows = 0
-
-                    # Process all data rows (header was already consumed by next(reader))
-                    for row in reader:
-                        if self.cancel_event.is_set():
-                            cancelled = True
-                            if not is_json_format:
-                                outfile.close()
-                            # Write partial file counts for logging
-                            if current_rows > 0:
-                                if is_json_format and current_json_data:
-                                    # Write remaining JSON data before cancelling
-                                    with open(output_path, 'w', encoding='utf-8') as json_file:
-                                        json.dump(current_json_data, json_file, separators=(',', ':'))
-                                per_file_row_counts.append(current_rows)
-                                output_data_row_count += current_rows
-                            break
-
-                        # Count this as a data row (not header)
-                        input_data_row_count += 1
-                        processed_rows += 1
-                        
-                        # Filter row to only include selected columns
-                        filtered_row = [row[i] if i < len(row) else '' for i in header_indices]
-                        
-                        # Update progress every 100 rows
-                        if processed_rows % 100 == 0:
-                            self.update_progress(processed_rows, total_rows, output_path, part_num)
-                        
-                        if is_json_format:
-                            # Convert row to JSON object using renamed header and row
-                            row_dict = dict(zip(output_header, filtered_row))
-                            current_json_data.append(row_dict)
-                            current_rows += 1
-                            
-                            # Efficient size estimation for JSON
-                            if mode == "size":
-                                if current_rows <= 10:
-                                    # For first 10 rows, calculate actual size to get better average
-                                    row_json_size = len(json.dumps(row_dict, separators=(',', ':')))
-                                    estimated_size += row_json_size + (1 if current_rows > 1 else 0)  # +1 for comma
-                                    avg_row_size = estimated_size / current_rows if current_rows > 0 else 0
-                                else:
-                                    # Use average size estimation for subsequent rows
-                                    estimated_size += avg_row_size + 1  # +1 for comma
-                            
-                            # Check if we need to split
-                            split_needed = False
-                            if mode == "size":
-                                split_needed = estimated_size >= max_size_bytes
-                            else:  # mode == "rows"
-                                split_needed = current_rows >= max_rows
-                                
-                            if split_needed:
-                                # Write JSON file (compact format for better performance)
-                                with open(output_path, 'w', encoding='utf-8') as json_file:
-                                    json.dump(current_json_data, json_file, separators=(',', ':'))
-                                
-                                per_file_row_counts.append(current_rows)
-                                output_data_row_count += current_rows
-                                part_num += 1
-                                output_path = os.path.join(output_dir, f"{base_filename}_{part_num}{file_extension}")
-                                current_json_data = []
-                                current_rows = 0
-                                estimated_size = 2  # Reset to "[]"
-                        else:
-                            # Check if we need to split before writing this row
-                            outfile.flush()
-                            if (
-                                (mode == "size" and current_size >= max_size_bytes) or
-                                (mode == "rows" and current_rows >= max_rows)
-                            ):
-                                outfile.close()
-                                per_file_row_counts.append(current_rows)
-                                output_data_row_count += current_rows
-                                part_num += 1
-                                output_path = os.path.join(output_dir, f"{base_filename}_{part_num}{file_extension}")
-                                outfile = open(output_path, 'w', newline='', encoding='utf-8')
-                                writer = csv.writer(outfile, delimiter=custom_delimiter, quoting=quote_mode)
-                                if include_header:  # NEW: Conditionally write header for new files
-                                    writer.writerow(output_header)  # Write renamed header
-                                current_size = outfile.tell()
-                                current_rows = 0
-
-                            # Write the current data row
-                            writer.writerow(filtered_row)  # Write filtered row
-                            current_size = outfile.tell()
-                            current_rows += 1
-
-                    # If cancelled during splitting, write cancellation log
-                    if cancelled:
-                        self.write_cancellation_log(input_file, output_dir, file_extension, custom_delimiter, 
-                                                   input_data_row_count, output_data_row_count, per_file_row_counts, 
-                                                   "during file splitting", part_num)
-                        self.root.after(0, lambda: self.show_cancelled())
-                        return
-
-                    # Handle the last file (normal completion)
-                    if is_json_format:
-                        if current_json_data:  # Write remaining data
-                            with open(output_path, 'w', encoding='utf-8') as json_file:
-                                json.dump(current_json_data, json_file, separators=(',', ':'))
-                            per_file_row_counts.append(current_rows)
-                            output_data_row_count += current_rows
-                    else:
-                        outfile.close()
-                        per_file_row_counts.append(current_rows)
-                        output_data_row_count += current_rows
-
-            # Store row counts for validation
-            self.input_row_count = input_data_row_count
-            self.output_row_count = output_data_row_count
-
-            # Final progress update
-            self.update_progress(total_rows, total_rows, output_path, part_num)
-
-            # Create log file for successful completion
-            if self.create_log.get():
-                self.write_completion_log(input_file, output_dir, file_extension, custom_delimiter,
-                                        input_data_row_count, output_data_row_count, per_file_row_counts, part_num)
-            
-            self.root.after(0, lambda: self.show_success(part_num, output_dir))
-            
+                self.root.after(0, lambda: self.show_success(result.parts, result.output_dir))
         except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", f"An error occurred: {e}"))
+            msg = f"An error occurred: {e}"  # e is unbound once the except block ends
+            self.root.after(0, lambda msg=msg: messagebox.showerror("Error", msg))
         finally:
             self.root.after(0, self.reset_ui)
 
-    def write_cancellation_log(self, input_file, output_dir, file_extension, custom_delimiter, 
-                              input_rows, output_rows, per_file_row_counts, cancel_phase, parts_created):
-        """Write log entry for cancelled operations"""
-        if not self.create_log.get():
-            return
-            
-        log_path = os.path.join(output_dir, "log.txt")
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        input_file_size = os.path.getsize(input_file)
-        base_filename = os.path.splitext(os.path.basename(input_file))[0]
-
-        with open(log_path, 'a', encoding='utf-8') as log_file:
-            log_file.write(f"\n")
-            log_file.write(f"File Splitter Log - CANCELLED\n")
-            log_file.write(f"Timestamp: {timestamp}\n")
-            log_file.write(f"Input File: {input_file}\n")
-            log_file.write(f"Input File Size: {input_file_size:,} bytes\n")
-            log_file.write(f"Operation cancelled {cancel_phase}\n")
-            log_file.write(f"Total Data Rows Processed: {input_rows:,}\n")
-            log_file.write(f"Partial Files Created: {len(per_file_row_counts)}\n")
-            log_file.write(f"Output Format: {file_extension}\n")
-            if file_extension != ".json":
-                log_file.write(f"Delimiter Used: '{custom_delimiter}'\n")
-                log_file.write(f"Quote Mode: {self.quote_mode.get()}\n")
-                log_file.write(f"Header Row Included: {'Yes' if self.retain_header.get() else 'No'}\n")  # NEW
-            
-            # Log column filtering information
-            if len(self.selected_columns) < len(self.available_columns):
-                excluded_columns = [col for col in self.available_columns if col not in self.selected_columns]
-                log_file.write(f"Columns Included: {len(self.selected_columns)} of {len(self.available_columns)}\n")
-                log_file.write(f"Included Columns: {', '.join(self.selected_columns)}\n")
-                log_file.write(f"Excluded Columns: {', '.join(excluded_columns)}\n")
-            else:
-                log_file.write(f"All Columns Included: {len(self.available_columns)}\n")
-            log_file.write(f"\n")
-
-            # Log any partial files that were created
-            for i, row_count in enumerate(per_file_row_counts):
-                part_filename = os.path.join(output_dir, f"{base_filename}_{i+1}{file_extension}")
-                if os.path.exists(part_filename):
-                    part_size = os.path.getsize(part_filename)
-                    log_file.write(f"Partial File {i+1}: {row_count} data rows, {part_size:,} bytes\n")
-
-            log_file.write(f"\nTotal Data Rows in Partial Files: {output_rows:,}\n")
-            log_file.write("Validation: FAIL ❌ (Operation Cancelled)\n")
-            log_file.write(f"\n============================================================\n")
-
-    def write_completion_log(self, input_file, output_dir, file_extension, custom_delimiter,
-                           input_data_row_count, output_data_row_count, per_file_row_counts, part_num):
-        """Write log entry for successful completion"""
-        log_path = os.path.join(output_dir, "log.txt")
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        input_file_size = os.path.getsize(input_file)
-        base_filename = os.path.splitext(os.path.basename(input_file))[0]
-
-        with open(log_path, 'a', encoding='utf-8') as log_file:
-            log_file.write(f"\n")
-            log_file.write(f"File Splitter Log\n")
-            log_file.write(f"Timestamp: {timestamp}\n")
-            log_file.write(f"Input File: {input_file}\n")
-            log_file.write(f"Input File Size: {input_file_size:,} bytes\n")
-            log_file.write(f"Total Data Rows in Input File: {input_data_row_count:,}\n")
-            log_file.write(f"Total Files Created: {len(per_file_row_counts)}\n")  # FIXED: Use actual count
-            log_file.write(f"Output Format: {file_extension}\n")
-            if file_extension != ".json":
-                log_file.write(f"Delimiter Used: '{custom_delimiter}'\n")
-                log_file.write(f"Quote Mode: {self.quote_mode.get()}\n")
-                log_file.write(f"Header Row Included: {'Yes' if self.retain_header.get() else 'No'}\n")  # NEW
-            
-            # Log column filtering information
-            if len(self.selected_columns) < len(self.available_columns):
-                excluded_columns = [col for col in self.available_columns if col not in self.selected_columns]
-                log_file.write(f"Columns Included: {len(self.selected_columns)} of {len(self.available_columns)}\n")
-                log_file.write(f"Included Columns: {', '.join(self.selected_columns)}\n")
-                log_file.write(f"Excluded Columns: {', '.join(excluded_columns)}\n")
-            else:
-                log_file.write(f"All Columns Included: {len(self.available_columns)}\n")
-            log_file.write(f"\n")
-
-            # FIXED: Use len(per_file_row_counts) instead of part_num
-            for i in range(len(per_file_row_counts)):
-                part_filename = os.path.join(output_dir, f"{base_filename}_{i+1}{file_extension}")
-                part_size = os.path.getsize(part_filename)
-                row_count = per_file_row_counts[i]
-                log_file.write(f"File {i+1}: {row_count} data rows, {part_size:,} bytes\n")
-
-            log_file.write(f"\nTotal Data Rows in Split Files: {output_data_row_count:,}\n")
-            if input_data_row_count == output_data_row_count:
-                log_file.write("Validation: PASS ✅\n")
+    def start_threaded_task(self, title, task, status, describe):
+        """Run task(progress_callback, cancel_event) on a worker thread behind the progress bar and Cancel.
+
+        status turns the task's latest progress event into the status line, and describe
+        turns its result into the completion message; a None result means it was cancelled.
+        """
+        self.cancel_event.clear()
+        self.is_running = True
+        self.task_event = None
+
+        self.button_start.config(state=tk.DISABLED)
+        self.button_cancel.config(state=tk.NORMAL)
+        self.progress['value'] = 0
+        self.progress_percentage.set("0%")
+        self.progress_label.configure(style="TLabel")
+        self.current_file.set("Initializing...")
+        self.progress_label.grid()
+
+        thread = threading.Thread(target=self.run_task, args=(title, task, describe))
+        thread.daemon = True
+        thread.start()
+        self.poll_task(status)
+
+    def run_task(self, title, task, describe):
+        """Worker thread: run a task started by start_threaded_task and report its outcome"""
+        try:
+            result = task(self.on_task_event, self.cancel_event)
+            if result is None:
+                self.root.after(0, self.show_cancelled)
             else:
-                log_file.write("Validation: FAIL ❌\n")
-            log_file.write(f"\n============================================================\n")
+                msg = describe(result)
+                self.root.after(0, lambda: self.show_task_done(title, msg))
+        except Exception as e:
+            msg = f"An error occurred: {e}"  # e is unbound once the except block ends
+            self.root.after(0, lambda msg=msg: messagebox.showerror("Error", msg))
+        finally:
+            self.root.after(0, self.reset_ui)
+
+    def on_task_event(self, event):
+        """Task progress callback (worker thread) - the latest event is polled by poll_task"""
+        self.task_event = event
+
+    def poll_task(self, status):
+        """Refresh the progress bar from the task's latest event 10 times a second"""
+        event = self.task_event
+        if event and not self.cancel_event.is_set():
+            self.progress.configure(value=event.get('percentage', 0))
+            self.progress_percentage.set(f"{event.get('percentage', 0):.1f}%")
+            self.current_file.set(status(event))
+        if self.is_running:
+            self.root.after(100, lambda: self.poll_task(status))
+
+    def show_task_done(self, title, message):
+        self.progress.configure(value=100)
+        self.progress_percentage.set("100.0%")
+        self.current_file.set("Done")
+        self.progress_label.configure(style="ProgressSuccess.TLabel")
+        self.button_reset.config(state="normal")
+        messagebox.showinfo(title, message)
+
+    def on_split_event(self, event):
+        """Engine event callback (worker thread) - progress is polled from the snapshot instead"""
+        if event['type'] == 'notice':
+            self.root.after(0, lambda: messagebox.showinfo("Info", event['message']))
+
+    def poll_progress(self, engine, version):
+        """Refresh the statistics from the engine's progress snapshot 10 times a second"""
+        state = engine.progress.state
+        if state['version'] != version:
+            self.apply_progress(state)
+        if self.is_running:
+            self.root.after(100, lambda: self.poll_progress(engine, state['version']))
+
+    def apply_progress(self, state):
+        if state['total_rows'] is not None:
+            self.total_rows.set(f"{state['total_rows']:,}")
+        elif state['analyzed_rows']:
+            self.total_rows.set(f"Analyzing... {state['analyzed_rows']:,} rows")
+        elif state['phase']:
+            self.total_rows.set("Streaming..." if state['phase'] == "streaming" else "Analyzing file...")
+        if state['output_path']:
+            self.progress.configure(value=state['percentage'])
+            self.progress_percentage.set(f"{state['percentage']:.1f}%")
+            self.current_file.set(os.path.basename(state['output_path']))
+            self.rows_processed.set(f"{state['rows']:,}")
+            self.file_count.set(str(state['part_num']))
+
+    def cancel_operation(self):
+        if self.is_running:
+            self.cancel_event.set()
+            self.current_file.set("Cancelling...")
+            self.button_cancel.config(state=tk.DISABLED)
 
     def show_success(self, parts, directory):
         elapsed_time = time.time() - self.start_time
@@ -1765,11 +1656,15 @@ class FileSplitterApp:
         self.split_mode.set("Size (MB)")  # Reset to default split mode
         self.split_value.set("")  # Clear split value
         self.file_type.set(".csv")  # Reset to default file type
+        self.output_compression.set("None")  # Reset output compression
+        self.partition_column.set(NO_PARTITION)  # Reset partitioning
+        self.sort_column.set(NO_SORT)  # Reset sorting
+        self.sort_descending.set(False)
         self.use_custom_delim.set(False)  # Reset custom delimiter checkbox
         self.custom_delimiter.set("")  # Clear custom delimiter value
         self.quote_mode.set("Standard")  # Reset quote mode
         
-        # NOTE: We don't reset Settings menu options (open_dir_after_split, create_log, retain_header)
+        # NOTE: We don't reset Settings menu options (open_dir_after_split, create_log, retain_header, single_pass, parallel_split, pipelined, write_checkpoints, write_manifest, use_index, compressed_size_target, capture_profile)
         # because they are persistent user preferences
         
         # Clear error highlighting
@@ -1792,6 +1687,12 @@ class FileSplitterApp:
             # Disable buttons when no file selected
             self.output_browse_button.config(state="disabled")
             self.column_select_button.config(state="disabled")
+            self.partition_combo.config(state="disabled")
+            self.partition_column.set(NO_PARTITION)
+            self.sort_combo.config(state="disabled")
+            self.sort_column.set(NO_SORT)
+            self.sort_descending.set(False)
+            self.sort_descending_checkbox.state(["disabled"])
             self.split_value_entry.config(state="disabled")  # Disable split value input
             self.output_dir.set("")  # Clear output directory
             
@@ -1819,10 +1720,13 @@ class FileSplitterApp:
             # Enable buttons when file is selected
             self.output_browse_button.config(state="normal")
             self.column_select_button.config(state="normal")
+            self.partition_combo.config(state="readonly")
+            self.sort_combo.config(state="readonly")
+            self.sort_descending_checkbox.state(["!disabled"])
             self.split_value_entry.config(state="normal")  # Enable split value input
             
             # Enable delimiter options based on OUTPUT format
-            if self.file_type.get() != ".json":
+            if self.file_type.get() not in splitengine.JSON_EXTENSIONS:
                 # Output format uses delimiters - enable delimiter options regardless of input format
                 self.delim_checkbox.state(["!disabled"])
             else:
@@ -0,0 +1,76 @@
+"""Column projection of parsed rows and batched CSV part writing"""
+import csv
+
+import pytest
+
+import splitengine
+from splitengine import CsvPartWriter, RowProjection
+
+ROWS = [
+    ["1", "alice", "a@example.com", "NY"],
+    ["2", "bob"],                                      # Short row
+    ["3", "carol", "c@example.com", "LA", "extra"],    # Long row
+    [],
+    ["4", 'dan "the man"', "d@example.com", "SF"],
+]
+
+
+def bounds_checked(row, indices):
+    """The per-row list comprehension RowProjection replaced"""
+    return [row[i] if i < len(row) else '' for i in indices]
+
+
+@pytest.mark.parametrize("indices", [[0, 1, 2, 3], [0, 2], [3, 1, 0], [2], []])
+def test_projection_matches_bounds_checked_selection(indices):
+    projection = RowProjection(indices)
+    assert [list(row) for row in projection.project_rows(ROWS)] == [bounds_checked(row, indices) for row in ROWS]
+    assert [list(projection(row)) for row in ROWS] == [bounds_checked(row, indices) for row in ROWS]
+
+
+def test_short_rows_are_padded_and_long_rows_truncated():
+    rows = RowProjection([0, 1, 2, 3]).project_rows(ROWS)
+    assert list(rows[1]) == ["2", "bob", "", ""]
+    assert list(rows[2]) == ["3", "carol", "c@example.com", "LA"]
+    assert list(rows[3]) == ["", "", "", ""]
+
+
+def test_output_names_key_projected_rows():
+    projection = RowProjection([3, 0], ["city", "user_id"])
+    assert projection.project_rows(ROWS[:2]) == [{"city": "NY", "user_id": "1"}, {"city": "", "user_id": "2"}]
+
+
+def test_split_selects_and_renames_columns(tmp_path):
+    source = tmp_path / "people.csv"
+    with open(source, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows([["id", "name", "email", "city"]] + ROWS)
+    options = splitengine.SplitOptions(str(source), mode="rows", value=100, output_dir=str(tmp_path / "out"),
+                                       selected_columns=["city", "id"], column_renames={"city": "town"},
+                                       create_log=False)
+    result = splitengine.SplitEngine(options, lambda event: None).run()
+    assert result.status == "completed"
+    with open(tmp_path / "out" / "people_1.csv", encoding="utf-8", newline="") as f:
+        # Selected columns keep the input's order
+        assert list(csv.reader(f)) == [["id", "town"], ["1", "NY"], ["2", ""], ["3", "LA"], ["", ""], ["4", "SF"]]
+
+
+@pytest.mark.parametrize("limits", [{"max_rows": 3}, {"max_size_bytes": 200}, {"max_rows": 1000}],
+                         ids=["rows", "size", "one-part"])
+@pytest.mark.parametrize("quoting", [csv.QUOTE_MINIMAL, csv.QUOTE_ALL], ids=["minimal", "all"])
+def test_write_rows_matches_write_row(tmp_path, limits, quoting):
+    rows = [[str(i), f"name {i}", 'say "hi", ok' if i % 3 == 0 else "plain\nmultiline" if i % 5 == 0 else ""]
+            for i in range(50)]
+    outputs = {}
+    for name in ("batched", "per_row"):
+        folder = tmp_path / name
+        folder.mkdir()
+        writer = CsvPartWriter(str(folder), "part", ".csv", ",", quoting, header_row=["id", "name", "note"], **limits)
+        if name == "batched":
+            for start in range(0, len(rows), 7):
+                writer.write_rows(rows[start:start + 7])
+        else:
+            for row in rows:
+                writer.write_row(row)
+        writer.close()
+        outputs[name] = (writer.part_row_counts, {path.name: path.read_bytes() for path in folder.iterdir()})
+    assert outputs["batched"] == outputs["per_row"]
+    assert len(outputs["batched"][1]) > 1 or limits == {"max_rows": 1000}